@@ -0,0 +1,43 @@
+"""Add start to tombstones
+
+Revision ID: 0bf03b535211
+Revises: 804d7cb771dc
+Create Date: 2026-10-18 18:05:33.271940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bf03b535211'
+down_revision: Union[str, Sequence[str], None] = '804d7cb771dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # cancelled events of the calendar feed need the start of the deleted appointment.
+    # date + timetz is a timestamptz, kept as such so it is sent in UTC like the live event
+    op.add_column("tombstones", sa.Column("starts_at", sa.TIMESTAMP(timezone=True)))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_appointment_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO tombstones (entity, entity_id, doctor_id, patient_id, starts_at)
+            VALUES (TG_ARGV[0], OLD.id, OLD.doctor_id, OLD.patient_id, OLD.date + OLD.time);
+            RETURN NULL;
+        END $$
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_appointment_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO tombstones (entity, entity_id, doctor_id, patient_id)
+            VALUES (TG_ARGV[0], OLD.id, OLD.doctor_id, OLD.patient_id);
+            RETURN NULL;
+        END $$
+    """)
+    op.drop_column("tombstones", "starts_at")
@@ -0,0 +1,46 @@
+"""Add doctors search index
+
+Revision ID: 1700015f9326
+Revises: 3c8d0c23aeb2
+Create Date: 2026-10-18 09:12:41.507318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1700015f9326'
+down_revision: Union[str, Sequence[str], None] = '3c8d0c23aeb2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # unaccent() is only STABLE, generated columns and indexes need an IMMUTABLE wrapper
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    op.add_column(
+        "doctors",
+        sa.Column("search_text", sa.Text,
+                  sa.Computed("f_unaccent(lower(first_name || ' ' || last_name || ' ' || specialty || ' ' || city))",
+                              persisted=True))
+    )
+    op.create_index("ix_doctors_search_text_trgm", "doctors", ["search_text"],
+                    postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"})
+    op.create_index("ix_doctors_postal_code", "doctors", ["postal_code"])
+
+def downgrade() -> None:
+    op.drop_index("ix_doctors_postal_code", table_name="doctors")
+    op.drop_index("ix_doctors_search_text_trgm", table_name="doctors")
+    op.drop_column("doctors", "search_text")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
@@ -0,0 +1,31 @@
+"""Add appointments slot constraints
+
+Revision ID: 1859ab0383d7
+Revises: be9f534cbc32
+Create Date: 2026-10-18 10:41:55.213904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1859ab0383d7'
+down_revision: Union[str, Sequence[str], None] = 'be9f534cbc32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing double bookings have to be resolved before this runs.
+    # the doctor constraint's index replaces the plain availability index on the same columns
+    op.drop_index("ix_appointments_doctor_slot", table_name="appointments")
+    op.create_unique_constraint("uq_appointments_doctor_slot", "appointments", ["doctor_id", "date", "time"])
+    op.create_unique_constraint("uq_appointments_patient_slot", "appointments", ["patient_id", "date", "time"])
+
+def downgrade() -> None:
+    op.drop_constraint("uq_appointments_patient_slot", "appointments", type_="unique")
+    op.drop_constraint("uq_appointments_doctor_slot", "appointments", type_="unique")
+    op.create_index("ix_appointments_doctor_slot", "appointments", ["doctor_id", "date", "time"])
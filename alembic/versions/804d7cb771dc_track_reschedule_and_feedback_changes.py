@@ -0,0 +1,71 @@
+"""Track reschedule and feedback changes
+
+Revision ID: 804d7cb771dc
+Revises: ddad73dd6e6c
+Create Date: 2026-10-18 16:48:12.904517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '804d7cb771dc'
+down_revision: Union[str, Sequence[str], None] = 'ddad73dd6e6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ("reschedules", "feedbacks"):
+        op.add_column(table, sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False,
+                                       server_default=sa.text("now()")))
+        op.execute(f"""
+            CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE
+            ON {table} FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+        """)
+    # /sync finds a patient's changes the way the calendar feed finds a doctor's
+    op.create_index("ix_appointments_patient_updated_at", "appointments", ["patient_id", "updated_at"])
+
+    # reschedules and feedbacks carry neither doctor nor patient, a change to one of them
+    # touches its appointment so (doctor_id | patient_id, updated_at) finds it too
+    op.execute("""
+        CREATE FUNCTION touch_parent_appointment() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE appointments SET updated_at = now() WHERE id = NEW.appointment_id;
+            RETURN NULL;
+        END $$
+    """)
+    # when the whole appointment is deleted the cascade finds no appointment left and records
+    # nothing, the appointment's own tombstone covers its children
+    op.execute("""
+        CREATE FUNCTION record_child_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO tombstones (entity, entity_id, doctor_id, patient_id)
+            SELECT TG_ARGV[0], OLD.appointment_id, doctor_id, patient_id
+            FROM appointments WHERE id = OLD.appointment_id;
+            RETURN NULL;
+        END $$
+    """)
+    for table, entity in (("reschedules", "reschedule"), ("feedbacks", "feedback")):
+        op.execute(f"""
+            CREATE TRIGGER {table}_touch_appointment AFTER INSERT OR UPDATE
+            ON {table} FOR EACH ROW EXECUTE FUNCTION touch_parent_appointment()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_record_tombstone AFTER DELETE
+            ON {table} FOR EACH ROW EXECUTE FUNCTION record_child_tombstone('{entity}')
+        """)
+
+def downgrade() -> None:
+    for table in ("feedbacks", "reschedules"):
+        op.execute(f"DROP TRIGGER {table}_record_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER {table}_touch_appointment ON {table}")
+    op.execute("DROP FUNCTION record_child_tombstone()")
+    op.execute("DROP FUNCTION touch_parent_appointment()")
+    op.drop_index("ix_appointments_patient_updated_at", table_name="appointments")
+    for table in ("feedbacks", "reschedules"):
+        op.execute(f"DROP TRIGGER {table}_touch_updated_at ON {table}")
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,115 @@
+"""Create doctor stats table
+
+Revision ID: 99ac9f546766
+Revises: dec05add41cc
+Create Date: 2026-10-18 14:02:51.306127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99ac9f546766'
+down_revision: Union[str, Sequence[str], None] = 'dec05add41cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rating aggregates of each doctor, kept up to date by triggers on doctors,
+    # feedbacks and appointments (scripts/rebuild_doctor_stats.py repairs them)
+    op.create_table(
+        "doctor_stats",
+        sa.Column("doctor_id", sa.Integer, sa.ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("rating_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("rating_sum", sa.Integer, nullable=False, server_default="0"),
+        # number of feedbacks rated 0 to 4, rating r at index r + 1
+        sa.Column("rating_histogram", postgresql.ARRAY(sa.Integer), nullable=False, server_default="{0,0,0,0,0}"),
+        sa.Column("rating_avg", sa.Float, sa.Computed(
+            "CASE WHEN rating_count > 0 THEN rating_sum::float8 / rating_count ELSE 0 END", persisted=True)),
+    )
+    # walked backwards by the home search sorted by rating
+    op.create_index("ix_doctor_stats_rating", "doctor_stats", ["rating_avg", "rating_count", "doctor_id"])
+
+    op.execute("""
+        INSERT INTO doctor_stats (doctor_id, rating_count, rating_sum, rating_histogram)
+        SELECT doctors.id, count(feedbacks.rating), coalesce(sum(feedbacks.rating), 0),
+               ARRAY[count(*) FILTER (WHERE feedbacks.rating = 0), count(*) FILTER (WHERE feedbacks.rating = 1),
+                     count(*) FILTER (WHERE feedbacks.rating = 2), count(*) FILTER (WHERE feedbacks.rating = 3),
+                     count(*) FILTER (WHERE feedbacks.rating = 4)]
+        FROM doctors
+        LEFT JOIN appointments ON appointments.doctor_id = doctors.id
+        LEFT JOIN feedbacks ON feedbacks.appointment_id = appointments.id
+        GROUP BY doctors.id
+    """)
+
+    op.execute("""
+        CREATE FUNCTION add_doctor_rating(doctor integer, rating integer, delta integer) RETURNS void LANGUAGE sql AS $$
+            UPDATE doctor_stats SET rating_count = rating_count + delta,
+                                    rating_sum = rating_sum + delta * rating,
+                                    rating_histogram[rating + 1] = rating_histogram[rating + 1] + delta
+            WHERE doctor_id = doctor
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION create_doctor_stats() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO doctor_stats (doctor_id) VALUES (NEW.id);
+            RETURN NULL;
+        END $$
+    """)
+    # when a whole appointment is deleted its feedback is uncounted before the cascade,
+    # by then the appointment is gone and sync_doctor_stats_feedback finds no doctor
+    op.execute("""
+        CREATE FUNCTION sync_doctor_stats_appointment() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM add_doctor_rating(OLD.doctor_id, rating, -1)
+            FROM feedbacks WHERE appointment_id = OLD.id AND rating IS NOT NULL;
+            RETURN OLD;
+        END $$
+    """)
+    op.execute("""
+        CREATE FUNCTION sync_doctor_stats_feedback() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                IF OLD.rating IS NOT NULL THEN
+                    PERFORM add_doctor_rating(doctor_id, OLD.rating, -1)
+                    FROM appointments WHERE id = OLD.appointment_id;
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                IF NEW.rating IS NOT NULL THEN
+                    PERFORM add_doctor_rating(doctor_id, NEW.rating, 1)
+                    FROM appointments WHERE id = NEW.appointment_id;
+                END IF;
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER doctors_create_stats AFTER INSERT
+        ON doctors FOR EACH ROW EXECUTE FUNCTION create_doctor_stats()
+    """)
+    op.execute("""
+        CREATE TRIGGER appointments_sync_doctor_stats BEFORE DELETE
+        ON appointments FOR EACH ROW EXECUTE FUNCTION sync_doctor_stats_appointment()
+    """)
+    op.execute("""
+        CREATE TRIGGER feedbacks_sync_doctor_stats AFTER INSERT OR DELETE OR UPDATE OF rating
+        ON feedbacks FOR EACH ROW EXECUTE FUNCTION sync_doctor_stats_feedback()
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER feedbacks_sync_doctor_stats ON feedbacks")
+    op.execute("DROP TRIGGER appointments_sync_doctor_stats ON appointments")
+    op.execute("DROP TRIGGER doctors_create_stats ON doctors")
+    op.execute("DROP FUNCTION sync_doctor_stats_feedback()")
+    op.execute("DROP FUNCTION sync_doctor_stats_appointment()")
+    op.execute("DROP FUNCTION create_doctor_stats()")
+    op.execute("DROP FUNCTION add_doctor_rating(integer, integer, integer)")
+    op.drop_index("ix_doctor_stats_rating", table_name="doctor_stats")
+    op.drop_table("doctor_stats")
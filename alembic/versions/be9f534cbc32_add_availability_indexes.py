@@ -0,0 +1,28 @@
+"""Add availability indexes
+
+Revision ID: be9f534cbc32
+Revises: 1700015f9326
+Create Date: 2026-10-18 10:03:27.846120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'be9f534cbc32'
+down_revision: Union[str, Sequence[str], None] = '1700015f9326'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # probed once per (doctor, slot) by the earliest available slot search
+    op.create_index("ix_appointments_doctor_slot", "appointments", ["doctor_id", "date", "time"])
+    op.create_index("ix_doctors_specialty_city", "doctors", ["specialty", "city"])
+
+def downgrade() -> None:
+    op.drop_index("ix_doctors_specialty_city", table_name="doctors")
+    op.drop_index("ix_appointments_doctor_slot", table_name="appointments")
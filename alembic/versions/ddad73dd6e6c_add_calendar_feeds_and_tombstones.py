@@ -0,0 +1,82 @@
+"""Add calendar feeds and tombstones
+
+Revision ID: ddad73dd6e6c
+Revises: 99ac9f546766
+Create Date: 2026-10-18 15:27:40.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ddad73dd6e6c'
+down_revision: Union[str, Sequence[str], None] = '99ac9f546766'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # now() is stable, existing rows get it as a fast default without a table rewrite
+    op.add_column("appointments", sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False,
+                                            server_default=sa.text("now()")))
+    op.create_index("ix_appointments_doctor_updated_at", "appointments", ["doctor_id", "updated_at"])
+
+    op.execute("""
+        CREATE FUNCTION touch_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER appointments_touch_updated_at BEFORE UPDATE
+        ON appointments FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+    """)
+
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.BigInteger, primary_key=True, nullable=False),
+        sa.Column("entity", sa.String, nullable=False),
+        sa.Column("entity_id", sa.Integer, nullable=False),
+        sa.Column("doctor_id", sa.Integer),
+        sa.Column("patient_id", sa.Integer),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_tombstones_doctor_deleted_at", "tombstones", ["doctor_id", "deleted_at"])
+    op.create_index("ix_tombstones_patient_deleted_at", "tombstones", ["patient_id", "deleted_at"])
+
+    # the entity name is passed as trigger argument
+    op.execute("""
+        CREATE FUNCTION record_appointment_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO tombstones (entity, entity_id, doctor_id, patient_id)
+            VALUES (TG_ARGV[0], OLD.id, OLD.doctor_id, OLD.patient_id);
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER appointments_record_tombstone AFTER DELETE
+        ON appointments FOR EACH ROW EXECUTE FUNCTION record_appointment_tombstone('appointment')
+    """)
+
+    op.create_table(
+        "calendar_feeds",
+        sa.Column("token_hash", sa.String(64), primary_key=True, nullable=False),
+        sa.Column("doctor_id", sa.Integer, sa.ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, unique=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+
+def downgrade() -> None:
+    op.drop_table("calendar_feeds")
+    op.execute("DROP TRIGGER appointments_record_tombstone ON appointments")
+    op.execute("DROP FUNCTION record_appointment_tombstone()")
+    op.drop_index("ix_tombstones_patient_deleted_at", table_name="tombstones")
+    op.drop_index("ix_tombstones_doctor_deleted_at", table_name="tombstones")
+    op.drop_table("tombstones")
+    op.execute("DROP TRIGGER appointments_touch_updated_at ON appointments")
+    op.execute("DROP FUNCTION touch_updated_at()")
+    op.drop_index("ix_appointments_doctor_updated_at", table_name="appointments")
+    op.drop_column("appointments", "updated_at")
@@ -0,0 +1,67 @@
+"""Create accounts table
+
+Revision ID: dec05add41cc
+Revises: e5e295d67dd6
+Create Date: 2026-10-18 12:36:14.920853
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dec05add41cc'
+down_revision: Union[str, Sequence[str], None] = 'e5e295d67dd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # one row per email across patients and doctors, the primary key makes
+    # emails unique over both tables and serves the login lookup
+    op.create_table(
+        "accounts",
+        sa.Column("email", sa.String, primary_key=True, nullable=False),
+        sa.Column("role", sa.String, nullable=False),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("password", sa.String, nullable=False),
+        sa.UniqueConstraint("role", "user_id", name="uq_accounts_role_user")
+    )
+
+    # emails already used by both a patient and a doctor have to be changed before this runs
+    op.execute("INSERT INTO accounts (email, role, user_id, password) SELECT email, 'patient', id, password FROM patients")
+    op.execute("INSERT INTO accounts (email, role, user_id, password) SELECT email, 'doctor', id, password FROM doctors")
+
+    # the role is passed as trigger argument
+    op.execute("""
+        CREATE FUNCTION sync_account() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM accounts WHERE role = TG_ARGV[0] AND user_id = OLD.id;
+                RETURN OLD;
+            ELSIF TG_OP = 'INSERT' THEN
+                INSERT INTO accounts (email, role, user_id, password)
+                VALUES (NEW.email, TG_ARGV[0], NEW.id, NEW.password);
+            ELSE
+                UPDATE accounts SET email = NEW.email, password = NEW.password
+                WHERE role = TG_ARGV[0] AND user_id = OLD.id;
+            END IF;
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER patients_sync_account AFTER INSERT OR DELETE OR UPDATE OF email, password
+        ON patients FOR EACH ROW EXECUTE FUNCTION sync_account('patient')
+    """)
+    op.execute("""
+        CREATE TRIGGER doctors_sync_account AFTER INSERT OR DELETE OR UPDATE OF email, password
+        ON doctors FOR EACH ROW EXECUTE FUNCTION sync_account('doctor')
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER doctors_sync_account ON doctors")
+    op.execute("DROP TRIGGER patients_sync_account ON patients")
+    op.execute("DROP FUNCTION sync_account()")
+    op.drop_table("accounts")
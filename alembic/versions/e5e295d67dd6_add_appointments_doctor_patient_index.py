@@ -0,0 +1,28 @@
+"""Add appointments doctor patient index
+
+Revision ID: e5e295d67dd6
+Revises: 1859ab0383d7
+Create Date: 2026-10-18 11:20:08.377451
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5e295d67dd6'
+down_revision: Union[str, Sequence[str], None] = '1859ab0383d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# lookups by doctor_id or patient_id (lists, conflict checks and the cascading deletes from
+# doctors and patients) already use the leading column of the unique slot constraints,
+# what is left is the doctor's patients list which can then be an index only scan
+def upgrade() -> None:
+    op.create_index("ix_appointments_doctor_patient", "appointments", ["doctor_id", "patient_id"])
+
+def downgrade() -> None:
+    op.drop_index("ix_appointments_doctor_patient", table_name="appointments")
@@ -0,0 +1,260 @@
+# IN-PROCESS ENDPOINT BENCHMARKS
+#
+#   python -m benchmarks.run                   compare against benchmarks/baseline.json
+#   python -m benchmarks.run --save-baseline   record the current numbers as the baseline
+#
+# drives main.app through httpx's ASGI transport (no network) against the configured
+# database, which should hold a realistic directory (see scripts/generate_dataset.py).
+# the benchmark users, doctors and their history are created on the first run and reused.
+# exits with 1 when a scenario is slower, answers less requests per second, fails or
+# rejects (503) more requests or runs more SQL statements per request than the baseline allows.
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+import httpx
+from sqlalchemy import delete, select
+from config import settings
+from database import SessionLocal
+from main import app
+from querycount import count_queries
+import models
+import oauth2
+import utils
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BENCH_PASSWORD = "bench-password"
+BENCH_DOCTORS = 5
+BENCH_PATIENTS = 50
+
+# booking and rescheduling use slots this far in the future, removed after the run
+FUTURE = datetime.date.today() + datetime.timedelta(days=3 * 365)
+
+SEARCH_TERMS = ["", "card", "dermato", "oran", "alger", "benali", "16000", "pediatre", "constantine"]
+
+
+def seed(history: int):
+    # benchmark doctors and patients, each patient with `history` past appointments
+    with SessionLocal() as db:
+        doctors = db.scalars(select(models.Doctor).where(models.Doctor.email.like("bench-doctor-%"))
+                             .order_by(models.Doctor.id)).all()
+        patients = db.scalars(select(models.Patient).where(models.Patient.email.like("bench-patient-%"))
+                              .order_by(models.Patient.id)).all()
+        if len(doctors) == BENCH_DOCTORS and len(patients) == BENCH_PATIENTS:
+            return [doctor.id for doctor in doctors], [patient.id for patient in patients]
+
+        # +2137 / +2138 phones, the generated dataset uses +2135 / +2136
+        password = utils.pwd_context.hash(BENCH_PASSWORD)
+        doctors = [models.Doctor(first_name="Bench", last_name=f"Doctor{n}", email=f"bench-doctor-{n}@felwaqt.test",
+                                 phone=f"+2137{n:08d}", specialty="Cardiologue", city="Oran", street="Bench street",
+                                 postal_code="31000", password=password)
+                   for n in range(BENCH_DOCTORS)]
+        patients = [models.Patient(first_name="Bench", last_name=f"Patient{n}", email=f"bench-patient-{n}@felwaqt.test",
+                                   phone=f"+2138{n:08d}", password=password)
+                    for n in range(BENCH_PATIENTS)]
+        db.add_all(doctors + patients)
+        db.flush()
+
+        # one appointment per day for each patient, at a time only that patient uses,
+        # so neither the doctor nor the patient slot constraint can clash
+        today = datetime.date.today()
+        for p, patient in enumerate(patients):
+            slot_time = (datetime.datetime.combine(today, datetime.time(8)) + datetime.timedelta(minutes=p)).time()
+            db.add_all(models.Appointment(patient_id=patient.id, doctor_id=doctors[(p + k) % BENCH_DOCTORS].id,
+                                          date=today - datetime.timedelta(days=k + 1), time=slot_time,
+                                          case="Checkup", confirmed=True, done=True)
+                       for k in range(history))
+        db.commit()
+        return [doctor.id for doctor in doctors], [patient.id for patient in patients]
+
+
+def cleanup(patient_ids):
+    with SessionLocal() as db:
+        db.execute(delete(models.RescheduleRequest).where(models.RescheduleRequest.new_date >= FUTURE))
+        db.execute(delete(models.Appointment).where(models.Appointment.patient_id.in_(patient_ids),
+                                                    models.Appointment.date >= FUTURE))
+        db.commit()
+
+
+def scenarios(doctor_ids, patient_ids):
+    # name -> function(n) returning the (method, url, kwargs) of the n-th request
+    def auth(role, user_id):
+        return {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user_id, 'role': role})}"}
+
+    patient_headers = [auth("patient", patient_id) for patient_id in patient_ids]
+    doctor_headers = [auth("doctor", doctor_id) for doctor_id in doctor_ids]
+    booked = []
+
+    def future_slot(n):
+        # unique (date, time) per request
+        return (FUTURE + datetime.timedelta(days=n // 500)).isoformat(), f"{8 + (n % 500) // 50:02d}:{(n % 50):02d}:00"
+
+    def search(n):
+        return "GET", "/", {"params": {"search": SEARCH_TERMS[n % len(SEARCH_TERMS)], "limit": 20}}
+
+    def login(n):
+        return "POST", "/login/", {"data": {"username": f"bench-patient-{n % BENCH_PATIENTS}@felwaqt.test",
+                                            "password": BENCH_PASSWORD}}
+
+    def book(n):
+        date, time_ = future_slot(n)
+        return "POST", f"/patients/appointments/{doctor_ids[n % BENCH_DOCTORS]}", {
+            "json": {"date": date, "time": time_, "case": "Benchmark"},
+            "headers": patient_headers[n % BENCH_PATIENTS]}
+
+    def reschedule(n):
+        appointment_id, patient_index = booked[n % len(booked)]
+        date, time_ = future_slot(n + 250_000)
+        return "POST", f"/patients/reschedules/{appointment_id}", {
+            "json": {"new_date": date, "new_time": time_}, "headers": patient_headers[patient_index]}
+
+    def patient_appointments(n):
+        return "GET", "/patients/appointments", {"params": {"limit": 50}, "headers": patient_headers[n % BENCH_PATIENTS]}
+
+    def doctor_appointments(n):
+        return "GET", "/doctors/appointments", {"params": {"limit": 50}, "headers": doctor_headers[n % BENCH_DOCTORS]}
+
+    def doctor_patients(n):
+        return "GET", "/doctors/patients", {"params": {"limit": 50}, "headers": doctor_headers[n % BENCH_DOCTORS]}
+
+    def doctor_dashboard(n):
+        return "GET", "/doctors/dashboard", {"params": {"days": 14}, "headers": doctor_headers[n % BENCH_DOCTORS]}
+
+    return booked, {
+        "search": search,
+        "login": login,
+        "booking": book,
+        "rescheduling": reschedule,
+        "patient appointments": patient_appointments,
+        "doctor appointments": doctor_appointments,
+        "doctor patients": doctor_patients,
+        "doctor dashboard": doctor_dashboard,
+    }
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_scenario(client, make_request, requests: int, concurrency: int, on_response=None):
+    latencies = []
+    errors = rejected = 0
+    next_request = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, rejected
+        for n in next_request:
+            method, url, kwargs = make_request(n)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            # 503 is the fast fail of a saturated hashing pool, counted apart from real errors
+            if response.status_code == 503:
+                rejected += 1
+            elif response.status_code >= 500:
+                errors += 1
+            if on_response:
+                on_response(n, response)
+
+    with count_queries() as counter:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rejected": rejected,
+        "p50_ms": round(percentile(latencies, .50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, .95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, .99) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "sql_per_request": round(counter.count / requests, 2),
+    }
+
+
+def compare(results, baseline, tolerance: float):
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        # fast failures lower p95 and raise throughput, they have to be caught first
+        for key in ("errors", "rejected"):
+            if result[key] > expected.get(key, 0):
+                failures.append(f"{name}: {result[key]} {key} requests, baseline {expected.get(key, 0)}")
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {result['p95_ms']}ms, baseline {expected['p95_ms']}ms")
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            failures.append(f"{name}: {result['throughput_rps']} req/s, baseline {expected['throughput_rps']} req/s")
+        if result["sql_per_request"] > expected["sql_per_request"]:
+            failures.append(f"{name}: {result['sql_per_request']} SQL statements per request, "
+                            f"baseline {expected['sql_per_request']}")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API in process.")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--history", type=int, default=200, help="past appointments of each benchmark patient")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline")
+    parser.add_argument("--only", nargs="*", help="scenarios to run")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    doctor_ids, patient_ids = seed(args.history)
+    booked, all_scenarios = scenarios(doctor_ids, patient_ids)
+
+    def remember_booking(n, response):
+        if response.status_code == 200:
+            booked.append((response.json()["id"], n % BENCH_PATIENTS))
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in all_scenarios.items():
+                if args.only and name not in args.only:
+                    continue
+                if name == "rescheduling" and not booked:
+                    print("rescheduling skipped, it reschedules the appointments of the booking scenario")
+                    continue
+
+                # login is bound by password hashing, a tenth of the requests is enough, and past
+                # hashing_workers + hashing_queue_depth concurrent logins the others are rejected
+                requests, concurrency = args.requests, args.concurrency
+                if name == "login":
+                    requests = max(args.requests // 10, 1)
+                    concurrency = min(concurrency, settings.hashing_workers + settings.hashing_queue_depth)
+                results[name] = await run_scenario(client, make_request, requests, concurrency,
+                                                   remember_booking if name == "booking" else None)
+                print(f"{name:22} " + "  ".join(f"{key} {value}" for key, value in results[name].items()))
+    finally:
+        cleanup(patient_ids)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline to compare with, run with --save-baseline first.")
+        return
+
+    with open(BASELINE_PATH) as baseline_file:
+        failures = compare(results, json.load(baseline_file), args.tolerance)
+    if failures:
+        print("\n".join(failures))
+        sys.exit("Performance regressed against the baseline.")
+    print("No regression against the baseline.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
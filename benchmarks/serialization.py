@@ -0,0 +1,64 @@
+# SERIALISATION COST OF A LARGE APPOINTMENT LIST, DEFAULT PATH AGAINST FAST_JSON
+#
+#   python -m benchmarks.serialization --rows 10000
+#
+# cpu only, no database: the rows are transient ORM instances shaped like real appointments.
+# "default" reproduces what FastAPI does with a response_model (validate, dump to json
+# compatible python, json.dumps in JSONResponse), "fast_json" is serialization.list_response
+# and "orjson" the default path with the ORJSONResponse used for the other endpoints.
+import argparse
+import datetime
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from schemas import APPOINTMENT_OUT_LIST
+import models
+
+
+def appointments(count: int):
+    day = datetime.date(2026, 1, 1)
+    return [models.Appointment(id=n, patient_id=n % 5000, doctor_id=n % 50,
+                               date=day + datetime.timedelta(days=n // 16),
+                               time=datetime.time(9 + n % 16 // 2, 30 * (n % 2), tzinfo=datetime.timezone.utc),
+                               case="Consultation", done=n % 3 == 0, confirmed=n % 2 == 0)
+            for n in range(count)]
+
+
+def default_path(rows):
+    validated = APPOINTMENT_OUT_LIST.validate_python(rows, from_attributes=True)
+    return JSONResponse(APPOINTMENT_OUT_LIST.dump_python(validated, mode="json")).body
+
+
+def orjson_path(rows):
+    validated = APPOINTMENT_OUT_LIST.validate_python(rows, from_attributes=True)
+    return ORJSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_json_path(rows):
+    return APPOINTMENT_OUT_LIST.dump_json(APPOINTMENT_OUT_LIST.validate_python(rows, from_attributes=True))
+
+
+def best_time(function, rows, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the serialisation paths of a list response.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = appointments(args.rows)
+    baseline = best_time(default_path, rows, args.repeat)
+    for name, function in (("default", default_path), ("orjson", orjson_path), ("fast_json", fast_json_path)):
+        elapsed = baseline if function is default_path else best_time(function, rows, args.repeat)
+        print(f"{name:10} {elapsed * 1000:8.2f} ms  x{baseline / elapsed:.2f}  {len(function(rows))} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# IN-PROCESS CACHES FOR RARELY CHANGING, HEAVILY READ DATA
+import threading
+import time
+from collections import OrderedDict
+from config import settings
+
+
+class TTLCache:
+    # bounded LRU cache whose entries also expire after ttl seconds,
+    # entries can carry tags so every entry depending on a row can be dropped at once
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, value, tags)
+        self._tags = {}               # tag -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.maxsize:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _remove(self, key):
+        # caller holds the lock
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# etags.RenderedJSON of the DoctorOut by doctor id
+doctor_cache = TTLCache(settings.doctor_cache_size, settings.doctor_cache_ttl)
+
+# routes.home.SearchPage by (search, limit, cursor, sort), tagged with the ids of the doctors they contain
+search_cache = TTLCache(settings.search_cache_size, settings.search_cache_ttl)
+
+# (role, id) of the principals who wrote less than replica_stickiness seconds ago, their reads go
+# to the primary (see database.get_read_db). like every cache here it is per worker, the
+# felwaqt_primary cookie covers browsers whose next request lands on another worker
+recent_writers = TTLCache(settings.principal_cache_size, settings.replica_stickiness)
+
+# oauth2.Principal by (role, id), saves the user lookup of authenticated requests.
+# other workers only see a deleted user once the ttl runs out
+principal_cache = TTLCache(settings.principal_cache_size, settings.principal_cache_ttl)
@@ -1,14 +1,70 @@
+import random
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from cache import recent_writers
+from uuid import uuid4
+from metrics import InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
 DATABASE_URL = f'postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
+ASYNC_DATABASE_URL = f'postgresql+asyncpg://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}'
 
-engine = create_engine(DATABASE_URL)
+POOL_OPTIONS = {
+    "pool_size": settings.database_pool_size,
+    "max_overflow": settings.database_max_overflow,
+    "pool_timeout": settings.database_pool_timeout,
+    "pool_recycle": settings.database_pool_recycle,
+    "pool_pre_ping": settings.database_pool_pre_ping,
+}
+
+# psycopg2 never prepares statements server side, it works behind PgBouncer as is
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# read replicas, used by the read only endpoints through get_read_db
+replica_engines = [create_engine(url, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+                   for url in settings.database_replica_urls]
+ReplicaSessions = [sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines]
+
+# set by main.py on the responses to successful writes, while it lives the client reads from the
+# primary so it sees its own writes even if the replicas haven't replayed them yet
+PRIMARY_COOKIE = "felwaqt_primary"
+
+# async engine used by the routes in routes/aio.py when DATABASE_ASYNC is set,
+# requests waiting on postgres then stay on the event loop instead of holding a threadpool worker
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engines = []
+AsyncReplicaSessions = []
+
+if settings.database_async:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    connect_args = {}
+    if settings.database_pgbouncer:
+        # asyncpg prepares and caches every statement on its server connection, which in
+        # transaction mode may not be the one running the next statement
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args,
+                                       poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async_replica_engines = [create_async_engine(make_url(url).set(drivername="postgresql+asyncpg"),
+                                                 connect_args=connect_args, poolclass=InstrumentedAsyncQueuePool,
+                                                 **POOL_OPTIONS)
+                             for url in settings.database_replica_urls]
+    AsyncReplicaSessions = [async_sessionmaker(replica, autoflush=False, expire_on_commit=False)
+                            for replica in async_replica_engines]
+
 Base = declarative_base() # all models defined to create tables
                         # have to extedning this base class
 
@@ -17,4 +73,34 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def reads_from_primary(request: Request, replicas) -> bool:
+    # request.state.principal is the (role, id) of the bearer token, set by main.read_own_writes
+    if not replicas or PRIMARY_COOKIE in request.cookies:
+        return True
+    principal = getattr(request.state, "principal", None)
+    return principal is not None and recent_writers.get(principal) is not None
+
+
+def get_read_db(request: Request):
+    # session on a random replica, or on the primary without replicas or right after a write
+    # of the same client (cookie) or principal (bearer token)
+    session_factory = SessionLocal if reads_from_primary(request, ReplicaSessions) else random.choice(ReplicaSessions)
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db: #type: ignore
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    session_factory = AsyncSessionLocal if reads_from_primary(request, AsyncReplicaSessions) else random.choice(AsyncReplicaSessions)
+    async with session_factory() as db: #type: ignore
+        yield db
\ No newline at end of file
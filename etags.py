@@ -0,0 +1,37 @@
+# STRONG ETAGS AND CONDITIONAL GET FOR THE CACHED PUBLIC RESPONSES
+# bodies are rendered once when they are cached, the etag is a hash of the body so
+# every worker (and a CDN in front of them) agrees on it without sharing any state
+import hashlib
+from typing import NamedTuple
+from fastapi import Request, Response, status
+from config import settings
+
+
+class RenderedJSON(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def render_json(adapter, value) -> RenderedJSON:
+    # adapter is the pydantic TypeAdapter of value's type
+    body = adapter.dump_json(value)
+    return RenderedJSON(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def conditional_response(request: Request, rendered: RenderedJSON, headers=None) -> Response:
+    # 304 without a body when the client already holds this version
+    headers = {"ETag": rendered.etag, "Cache-Control": f"public, max-age={settings.public_max_age}",
+               **(headers or {})}
+    if etag_matches(request, rendered.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
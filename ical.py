@@ -0,0 +1,63 @@
+# ICALENDAR (RFC 5545) TEXT FOR THE DOCTORS' CALENDAR FEEDS
+import datetime
+
+CRLF = "\r\n"
+MAX_LINE_OCTETS = 75
+
+
+def escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold(line: str) -> str:
+    # lines longer than 75 octets go on over continuation lines starting with a space,
+    # never splitting a utf-8 character
+    encoded = line.encode()
+    parts = []
+    limit = MAX_LINE_OCTETS
+    while len(encoded) > limit:
+        cut = limit
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = MAX_LINE_OCTETS - 1
+    parts.append(encoded.decode())
+    return (CRLF + " ").join(parts) + CRLF
+
+
+def timestamp(value: datetime.datetime) -> str:
+    # aware values in UTC, naive ones as floating local time
+    if value.tzinfo is None:
+        return value.strftime("%Y%m%dT%H%M%S")
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def begin_calendar(name: str) -> str:
+    return "".join(fold(line) for line in (
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//FelWaqt//Appointments//EN", "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape(name)}",
+    ))
+
+
+def end_calendar() -> str:
+    return "END:VCALENDAR" + CRLF
+
+
+def event(uid: str, start: datetime.datetime, end: datetime.datetime, summary: str, confirmed: bool,
+          modified: datetime.datetime) -> str:
+    # SEQUENCE follows the modification time so every change supersedes the previous version
+    return "".join(fold(line) for line in (
+        "BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{timestamp(modified)}", f"LAST-MODIFIED:{timestamp(modified)}",
+        f"SEQUENCE:{int(modified.timestamp())}", f"DTSTART:{timestamp(start)}", f"DTEND:{timestamp(end)}",
+        f"SUMMARY:{escape(summary)}", f"STATUS:{'CONFIRMED' if confirmed else 'TENTATIVE'}", "END:VEVENT",
+    ))
+
+
+def cancelled_event(uid: str, start: datetime.datetime, end: datetime.datetime, deleted: datetime.datetime) -> str:
+    # what is left of a deleted appointment, for clients syncing incrementally. DTSTART is
+    # required in a calendar without METHOD, strict clients drop events missing it
+    return "".join(fold(line) for line in (
+        "BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{timestamp(deleted)}", f"SEQUENCE:{int(deleted.timestamp())}",
+        f"DTSTART:{timestamp(start)}", f"DTEND:{timestamp(end)}", "STATUS:CANCELLED", "END:VEVENT",
+    ))
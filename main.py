@@ -1,13 +1,57 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
 # import models
-from database import engine
-from routes import doctor, patient, auth, home
+from database import engine, async_engine, replica_engines, async_replica_engines, PRIMARY_COOKIE
+from routes import doctor, patient, auth, home, health, aio, availability, calendar_feed, sync
+from config import settings
+from cache import doctor_cache, search_cache, principal_cache, recent_writers
+from oauth2 import bearer_principal
+import metrics
 
 # models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse if settings.fast_json else JSONResponse)
+
+# named as on /health
+engines = {"sync": engine}
+if async_engine is not None:
+    engines["async"] = async_engine.sync_engine
+for n, replica in enumerate(replica_engines):
+    engines[f"replica-{n}"] = replica
+for n, replica in enumerate(async_replica_engines):
+    engines[f"async-replica-{n}"] = replica.sync_engine
+for instrumented in engines.values():
+    metrics.instrument_engine(instrumented)
+metrics.register_pools(engines)
+metrics.register_caches({"doctors": doctor_cache, "search": search_cache, "principals": principal_cache})
+
+app.add_middleware(metrics.RequestMetrics)
+
+@app.middleware("http")
+async def read_own_writes(request, call_next):
+    # after a successful write the client reads from the primary for a while (see database.get_read_db),
+    # keyed on the cookie for browsers and on the principal for bearer token clients that drop cookies
+    if not replica_engines:
+        return await call_next(request)
+
+    principal = bearer_principal(request.headers.get("authorization"))
+    request.state.principal = principal
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(PRIMARY_COOKIE, "1", max_age=settings.replica_stickiness, httponly=True, samesite="lax")
+        if principal is not None:
+            recent_writers.set(principal, True)
+    return response
+
+if settings.database_async:
+    # registered first so the async read endpoints take over the paths of their sync versions
+    app.include_router(aio.router)
 
 app.include_router(doctor.router)
 app.include_router(patient.router)
 app.include_router(auth.router)
-app.include_router(home.router)
\ No newline at end of file
+app.include_router(home.router)
+app.include_router(availability.router)
+app.include_router(calendar_feed.router)
+app.include_router(sync.router)
+app.include_router(health.router)
\ No newline at end of file
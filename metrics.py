@@ -0,0 +1,170 @@
+# PROMETHEUS METRICS, SERVED ON /metrics
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+REQUEST_LATENCY = Histogram("felwaqt_request_duration_seconds", "Time to answer a request",
+                            ["method", "route", "status"])
+
+REQUEST_STATEMENTS = Histogram("felwaqt_request_sql_statements", "SQL statements run per request",
+                               ["method", "route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+
+SQL_DURATION = Histogram("felwaqt_sql_statement_duration_seconds", "Time to run one SQL statement",
+                         buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+
+POOL_CHECKOUT_WAIT = Histogram("felwaqt_pool_checkout_wait_seconds", "Time waited for a pooled connection",
+                               buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30))
+
+PASSWORD_HASHING = Histogram("felwaqt_password_hashing_seconds", "Time spent hashing or verifying a password",
+                             ["operation"], buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5))
+
+# statements run by the current request, set by RequestMetrics and
+# shared with the threadpool worker running a sync handler or a streamed body. None outside
+# a request (scripts, startup), nothing is counted then
+request_statements: ContextVar[Optional[list]] = ContextVar("request_statements", default=None)
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool timing how long each checkout waits for a connection
+    # and counting the checkouts still waiting
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def connect(self):
+        start = time.perf_counter()
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super().connect()
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    # the same for the async engines, whose pool has to be the asyncio adapted one
+    pass
+
+
+class CacheCollector:
+    # exposes the hit / miss / eviction counters of the in-process caches
+    def __init__(self, caches: dict):
+        self.caches = caches
+
+    def collect(self):
+        hits = CounterMetricFamily("felwaqt_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("felwaqt_cache_misses", "Cache misses", labels=["cache"])
+        evictions = CounterMetricFamily("felwaqt_cache_evictions", "Entries evicted to respect the cache size",
+                                        labels=["cache"])
+        size = GaugeMetricFamily("felwaqt_cache_entries", "Entries currently cached", labels=["cache"])
+
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+            size.add_metric([name], stats["size"])
+
+        yield from (hits, misses, evictions, size)
+
+
+class PoolCollector:
+    # exposes the connection pools of every engine, read at scrape time since
+    # engine.dispose() replaces the pool
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        size = GaugeMetricFamily("felwaqt_pool_size", "Connections kept in the pool", labels=["pool"])
+        checked_out = GaugeMetricFamily("felwaqt_pool_checked_out", "Connections in use", labels=["pool"])
+        overflow = GaugeMetricFamily("felwaqt_pool_overflow", "Connections opened beyond the pool size",
+                                     labels=["pool"])
+        waiting = GaugeMetricFamily("felwaqt_pool_waiting", "Checkouts waiting for a connection", labels=["pool"])
+        # above 1 requests are running on overflow connections, or queueing once overflow is used up
+        saturation = GaugeMetricFamily("felwaqt_pool_saturation", "Connections in use over the pool size",
+                                       labels=["pool"])
+
+        for name, engine in self.engines.items():
+            stats = pool_stats(engine.pool)
+            size.add_metric([name], stats["size"])
+            checked_out.add_metric([name], stats["checked_out"])
+            overflow.add_metric([name], stats["overflow"])
+            waiting.add_metric([name], stats["waiting"])
+            saturation.add_metric([name], stats["checked_out"] / max(stats["size"], 1))
+
+        yield from (size, checked_out, overflow, waiting, saturation)
+
+
+def instrument_engine(engine):
+    # times every statement and counts it against the current request
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+        statements = request_statements.get()
+        if statements is not None:
+            statements[0] += 1
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        SQL_DURATION.observe(time.perf_counter() - conn.info["query_start_time"].pop())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def register_pools(engines: dict):
+    REGISTRY.register(PoolCollector(engines))
+
+
+def pool_stats(pool) -> dict:
+    # overflow is negative while the pool hasn't opened pool_size connections yet
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0), "max_overflow": pool._max_overflow,
+            "waiting": getattr(pool, "waiting", 0), "timeout": pool.timeout()}
+
+
+def register_caches(caches: dict):
+    REGISTRY.register(CacheCollector(caches))
+
+
+class RequestMetrics:
+    # pure ASGI middleware: an @app.middleware("http") one gets the response back before a
+    # streamed body is sent, the statements run while streaming (ndjson, calendar feed) and
+    # the time spent sending them would be missed
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        statements = [0]
+        token = request_statements.set(statements)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_and_record_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            # the route template keeps one series per endpoint instead of one per url
+            route = scope.get("route")
+            path = route.path if route else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], path, status_code).observe(time.perf_counter() - start)
+            REQUEST_STATEMENTS.labels(scope["method"], path).observe(statements[0])
+            request_statements.reset(token)
+
+
+def latest():
+    return generate_latest(), CONTENT_TYPE_LATEST
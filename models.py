@@ -1,6 +1,8 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.sql.sqltypes import Date, Time
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, Text, Computed, Index, UniqueConstraint, select, case, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import column_property, deferred
+from sqlalchemy.sql.sqltypes import Date, Time, TIMESTAMP, BigInteger
 from sqlalchemy.sql.expression import text
 
 
@@ -16,6 +18,23 @@ class Patient(Base):
     password = Column(String, nullable=False)
 
 
+class DoctorStat(Base):
+    # rating aggregates of a doctor, one row per doctor.
+    # written by triggers on doctors, appointments and feedbacks only, never by the application
+    __tablename__ = "doctor_stats"
+
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, server_default=text("0"))
+    rating_sum = Column(Integer, nullable=False, server_default=text("0"))
+    rating_histogram = Column(ARRAY(Integer), nullable=False, server_default=text("'{0,0,0,0,0}'")) # feedbacks rated 0 to 4
+    rating_avg = Column(Float, Computed("CASE WHEN rating_count > 0 THEN rating_sum::float8 / rating_count ELSE 0 END",
+                                        persisted=True))
+
+    __table_args__ = (
+        Index("ix_doctor_stats_rating", "rating_avg", "rating_count", "doctor_id"),
+    )
+
+
 class Doctor(Base):
     __tablename__ = "doctors"
 
@@ -31,6 +50,35 @@ class Doctor(Base):
     personal_picture = Column(String(200), unique=True) # href to the image
     role = Column(String, nullable=False, server_default=text("doctor"))
     password = Column(String, nullable=False)
+    # maintained by postgres, lower cased and unaccented text the home search runs on
+    search_text = Column(Text, Computed("f_unaccent(lower(first_name || ' ' || last_name || ' ' || specialty || ' ' || city))",
+                                        persisted=True))
+    # read from doctor_stats, the average is null until a first rating. deferred: only the
+    # queries rendering a DoctorOut load them, with undefer_group("rating"). correlated on
+    # doctors only, the rating sorted search joins doctor_stats itself
+    rating_count = deferred(func.coalesce(select(DoctorStat.rating_count).where(
+        DoctorStat.doctor_id == id).correlate_except(DoctorStat).scalar_subquery(), 0), group="rating")
+    rating_average = deferred(select(case((DoctorStat.rating_count > 0, DoctorStat.rating_avg))).where(
+        DoctorStat.doctor_id == id).correlate_except(DoctorStat).scalar_subquery(), group="rating")
+
+    __table_args__ = (
+        Index("ix_doctors_specialty_city", "specialty", "city"),
+    )
+
+
+class Account(Base):
+    # login credentials of patients and doctors, one row per email across both tables.
+    # written by triggers on patients and doctors only, never by the application
+    __tablename__ = "accounts"
+
+    email = Column(String, primary_key=True, nullable=False)
+    role = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    password = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("role", "user_id", name="uq_accounts_role_user"),
+    )
 
 
 class Appointment(Base):
@@ -52,6 +100,19 @@ class Appointment(Base):
 
     confirmed = Column(Boolean, nullable=False, server_default=text('False'))
 
+    # set by postgres on insert and by a trigger on every update, including the updates of
+    # the appointment's reschedule and feedback, read by the calendar feed and /sync
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    # a doctor or a patient can't hold two appointments on the same slot
+    __table_args__ = (
+        UniqueConstraint("doctor_id", "date", "time", name="uq_appointments_doctor_slot"),
+        UniqueConstraint("patient_id", "date", "time", name="uq_appointments_patient_slot"),
+        Index("ix_appointments_doctor_patient", "doctor_id", "patient_id"),
+        Index("ix_appointments_doctor_updated_at", "doctor_id", "updated_at"),
+        Index("ix_appointments_patient_updated_at", "patient_id", "updated_at"),
+    )
+
 
 class RescheduleRequest(Base):
     __tablename__ = "reschedules"
@@ -64,6 +125,8 @@ class RescheduleRequest(Base):
     new_date = Column(Date, nullable=False)
     new_time = Column(Time, nullable=False)
 
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
 
 class FeedBack(Base):
     __tablename__ = "feedbacks"
@@ -74,4 +137,35 @@ class FeedBack(Base):
     
     rating = Column(Integer)
     
-    plain = Column(String(200), nullable=False)
\ No newline at end of file
+    plain = Column(String(200), nullable=False)
+
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class Tombstone(Base):
+    # rows deleted from the synced tables, so sync clients learn about deletions.
+    # written by triggers only, no foreign keys since they outlive the rows they describe
+    __tablename__ = "tombstones"
+
+    id = Column(BigInteger, primary_key=True, nullable=False)
+    entity = Column(String, nullable=False) # table of the deleted row
+    entity_id = Column(Integer, nullable=False)
+    doctor_id = Column(Integer)
+    patient_id = Column(Integer)
+    # date and time of a deleted appointment, cancelled calendar events still need a DTSTART
+    starts_at = Column(TIMESTAMP(timezone=True))
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    __table_args__ = (
+        Index("ix_tombstones_doctor_deleted_at", "doctor_id", "deleted_at"),
+        Index("ix_tombstones_patient_deleted_at", "patient_id", "deleted_at"),
+    )
+
+
+class CalendarFeed(Base):
+    # iCalendar feed of a doctor, the token in the feed url is only stored as its sha256
+    __tablename__ = "calendar_feeds"
+
+    token_hash = Column(String(64), primary_key=True, nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, unique=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
\ No newline at end of file
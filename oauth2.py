@@ -3,11 +3,15 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 import schemas
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.security.utils import get_authorization_scheme_param
 from fastapi import HTTPException, status, Depends
-from database import get_db
+from database import get_db, get_async_db
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 from config import settings
+from cache import principal_cache
+from typing import NamedTuple, Optional
 
 # to extract the bearer token automatically from the header
 # and to define where clients should get tokens (/login)
@@ -55,20 +59,71 @@ def verify_access_token(token: str, credentials_exception):
     return token_data
     
 
-# dependency function to get the currently logged in user
-# it automatically extracts the token from the authorization header
-# "WWW-Authenticate": "Bearer" informs the client to send a bearer token
-def get_current_user(token: str=Depends(oauth2_scheme), db:Session=Depends(get_db)):
+
+def bearer_principal(authorization: Optional[str]):
+    # (role, id) of a valid bearer token, None otherwise. no database lookup,
+    # only meant to tell callers apart (see main.read_own_writes)
+    scheme, token = get_authorization_scheme_param(authorization)
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, [ALGORITHM])
+    except JWTError:
+        return None
+    if not payload.get("user_id") or not payload.get("role"):
+        return None
+    return (payload["role"], payload["user_id"])
+
+
+class Principal(NamedTuple):
+    # all that most handlers need to know about the caller
+    id: int
+    role: str
+
+
+USER_MODELS = {"doctor": models.Doctor, "patient": models.Patient}
+
+
+# the Principal of the bearer token, the existence check of the
+# user is cached for a short while so most authenticated calls don't query the database
+def get_current_principal(token: str=Depends(oauth2_scheme), db:Session=Depends(get_db)):
+    cred_exc = HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+    token_data = verify_access_token(token, cred_exc)
+
+    key = (token_data.role, token_data.id)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    user_model = USER_MODELS.get(token_data.role) #type: ignore
+    if user_model is None:
+        raise cred_exc
+
+    if not db.query(user_model.id).filter_by(id=token_data.id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    principal = Principal(id=token_data.id, role=token_data.role) #type: ignore
+    principal_cache.set(key, principal)
+    return principal
+
+
+# same as get_current_principal on an AsyncSession, used by the routes in routes/aio.py
+async def get_current_principal_async(token: str=Depends(oauth2_scheme), db:AsyncSession=Depends(get_async_db)):
     cred_exc = HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
     token_data = verify_access_token(token, cred_exc)
 
-    if token_data.role == "doctor":
-        user = db.query(models.Doctor).filter_by(id=token_data.id).first()
-    elif token_data.role == "patient":
-        user = db.query(models.Patient).filter_by(id=token_data.id).first()
-    else:
+    key = (token_data.role, token_data.id)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    user_model = USER_MODELS.get(token_data.role) #type: ignore
+    if user_model is None:
         raise cred_exc
 
-    if not user:
+    if not await db.get(user_model, token_data.id):
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+
+    principal = Principal(id=token_data.id, role=token_data.role) #type: ignore
+    principal_cache.set(key, principal)
+    return principal
@@ -0,0 +1,146 @@
+# HELPERS FOR CURSOR (KEYSET) PAGINATION, SYNC TOKENS AND STREAMED LISTS
+import base64
+import datetime
+import json
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_, literal
+from sqlalchemy.orm import Session, Bundle
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+
+# response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# response header carrying the token to send back as ?since= on the next sync
+SYNC_TOKEN_HEADER = "X-Sync-Token"
+
+# rows fetched per round trip from the server side cursor of a streamed list
+STREAM_BATCH_SIZE = 500
+
+
+def row_bundle(model, schema):
+    # the columns of model that schema serialises, loaded as one plain row per result:
+    # no ORM instance, no identity map entry, nothing for the session to track
+    return Bundle(model.__tablename__, *(getattr(model, field) for field in schema.model_fields), single_entity=True)
+
+
+def encode_cursor(*values) -> str:
+    # the cursor is the sort key of the last row sent, dates and times are stored as iso strings
+    raw = json.dumps(list(values), default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid pagination cursor.")
+    return values
+
+
+def sync_since(since, now: datetime.datetime):
+    # the time a sync token points to, None for a full sync (no token, or older than the tombstones)
+    if not since:
+        return None
+    try:
+        (value,) = decode_cursor(since, 1)
+        since_time = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        since_time = None
+
+    # tokens are issued from timestamptz values, a naive one was not issued here
+    if since_time is None or since_time.tzinfo is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid sync token.")
+
+    if since_time < now - datetime.timedelta(days=settings.tombstone_retention_days):
+        return None
+    return since_time
+
+
+def next_sync_token(now: datetime.datetime) -> str:
+    # now is the database clock, the one updated_at and deleted_at are written with
+    return encode_cursor(now - datetime.timedelta(seconds=settings.sync_overlap))
+
+
+def after_cursor(query, columns, cursor):
+    # keeps the rows sorting after the cursor, (a, b, c) > (x, y, z) is a single
+    # row comparison postgres answers with a range scan on a matching index
+    if not cursor:
+        return query
+
+    values = []
+    try:
+        for column, value in zip(columns, decode_cursor(cursor, len(columns))):
+            python_type = column.type.python_type
+            if python_type in (datetime.date, datetime.time):
+                value = python_type.fromisoformat(value)
+            values.append(literal(value, column.type))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid pagination cursor.")
+
+    return query.filter(tuple_(*columns) > tuple_(*values))
+
+
+def page_query(query, columns, cursor, limit: int):
+    # works on both orm queries and select() statements, the sort key is
+    # fetched along with each row to build the next cursor
+    query = after_cursor(query, columns, cursor)
+    return query.add_columns(*columns).order_by(*columns).limit(limit + 1)
+
+
+def split_page(rows, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(*rows[limit - 1][1:])
+    return [row[0] for row in rows[:limit]], next_cursor
+
+
+def keyset_page(query, columns, cursor, limit: int):
+    # returns one page of the query ordered by columns and the cursor of the next page
+    return split_page(page_query(query, columns, cursor, limit).all(), limit)
+
+
+async def keyset_page_async(db, statement, columns, cursor, limit: int):
+    # same as keyset_page for a select() run on an AsyncSession
+    result = await db.execute(page_query(statement, columns, cursor, limit))
+    return split_page(result.all(), limit)
+
+
+def stream_ndjson(query, columns, cursor, schema):
+    # one json document per line, read through a server side cursor so memory
+    # stays flat whatever the number of rows
+    statement = after_cursor(query, columns, cursor).order_by(*columns).statement
+    bind = query.session.get_bind()
+
+    def lines():
+        # dependencies with yield are closed before the body is sent,
+        # so the stream owns its session, on the database the handler read from
+        with Session(bind) as db:
+            result = db.execute(statement.execution_options(stream_results=True,
+                                                             yield_per=STREAM_BATCH_SIZE))
+            # one chunk per fetched batch rather than one per row, each chunk is a write to the client
+            for rows in result.scalars().partitions():
+                yield "".join(schema.model_validate(row, from_attributes=True).model_dump_json() + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def stream_ndjson_async(db, statement, columns, cursor, schema):
+    # same as stream_ndjson for a select() run on an AsyncSession
+    statement = after_cursor(statement, columns, cursor).order_by(*columns)
+    bind = db.bind
+
+    async def lines():
+        async with AsyncSession(bind) as stream_db:
+            result = await stream_db.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.scalars().partitions():
+                yield "".join(schema.model_validate(row, from_attributes=True).model_dump_json() + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,57 @@
+# COUNT THE SQL STATEMENTS SENT TO THE DATABASE
+# guards against N+1 regressions, e.g. in a test:
+#
+#   with assert_max_queries(3):
+#       client.get("/patients/reschedules", headers=headers)
+#
+# statements are counted on every engine in use (primary, replicas and the async ones),
+# whatever thread runs them, streamed bodies included when they are read inside the block.
+# the block should not overlap other traffic on the same engines
+from contextlib import contextmanager
+from sqlalchemy import event
+from database import engine, replica_engines, async_engine, async_replica_engines
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def engines_in_use():
+    # async engines are listened to through the sync engine they wrap
+    engines = [engine, *replica_engines]
+    if async_engine is not None:
+        engines.append(async_engine.sync_engine)
+    engines.extend(replica.sync_engine for replica in async_replica_engines)
+    return engines
+
+
+@contextmanager
+def count_queries(binds=None):
+    binds = engines_in_use() if binds is None else binds
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    for bind in binds:
+        event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for bind in binds:
+            event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(limit: int, binds=None):
+    with count_queries(binds) as counter:
+        yield counter
+
+    if counter.count > limit:
+        raise AssertionError(f"{counter.count} SQL statements were run, at most {limit} expected:\n"
+                             + "\n".join(counter.statements))
@@ -0,0 +1,109 @@
+# ASYNC VARIANTS OF THE READ HEAVY ENDPOINTS
+# included by main.py ahead of the other routers when DATABASE_ASYNC is set, they serve
+# the same paths and responses as their sync counterparts but wait on postgres on the event loop
+from typing import List, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer_group
+from database import get_async_db, get_async_read_db
+from oauth2 import get_current_principal_async, Principal
+from schemas import DoctorOut, AppointmentOut, DOCTOR_OUT, APPOINTMENT_OUT_LIST
+from pagination import keyset_page_async, stream_ndjson_async, NEXT_CURSOR_HEADER
+from cache import doctor_cache, search_cache
+from routes.home import search_statement, search_page, send_page
+from routes.doctor import APPOINTMENT_ROW
+from etags import render_json, conditional_response
+from serialization import list_response
+import models
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[DoctorOut], tags=["Home"])
+async def get_doctors_async(request: Request, search: str = "", limit: int = Query(20, ge=1, le=100),
+                            cursor: Optional[str] = None, sort: Literal["relevance", "rating"] = "relevance",
+                            db: AsyncSession = Depends(get_async_db)):
+    search = search.strip().lower()
+
+    key = (search, limit, cursor, sort)
+    page = search_cache.get(key)
+    if page is None:
+        result = await db.execute(search_statement(search, limit, cursor, sort))
+        page = search_page(result.all(), limit)
+        search_cache.set(key, page, tags=page.doctor_ids)
+
+    return send_page(request, page)
+
+
+@router.get("/doctors/appointments", response_model=List[AppointmentOut], tags=["Doctors"])
+async def get_doctor_appointments_async(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                                        stream: bool = False, db: AsyncSession = Depends(get_async_read_db),
+                                        current_doctor: Principal = Depends(get_current_principal_async)):
+
+    if current_doctor.role != "doctor": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns doctors only"
+        )
+
+    statement = select(APPOINTMENT_ROW).where(models.Appointment.doctor_id == current_doctor.id)
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+
+    if stream:
+        return stream_ndjson_async(db, statement, order, cursor, AppointmentOut)
+
+    doctor_appointments, next_cursor = await keyset_page_async(db, statement, order, cursor, limit)
+
+    if not doctor_appointments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Existing Appointments For You !")
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(APPOINTMENT_OUT_LIST, doctor_appointments, response)
+
+
+# {id:int} leaves /doctors/patients, /doctors/feedbacks, /doctors/dashboard... to the sync router
+@router.get("/doctors/{id:int}", response_model=DoctorOut, tags=["Doctors"])
+async def get_doctor_async(id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    rendered = doctor_cache.get(id)
+    if rendered is None:
+        # the async session can't lazy load the deferred rating
+        doctor = await db.get(models.Doctor, id, options=[undefer_group("rating")])
+        if not doctor:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Doctor with id: {id} not found!")
+
+        rendered = render_json(DOCTOR_OUT, DoctorOut.model_validate(doctor, from_attributes=True))
+        doctor_cache.set(id, rendered)
+
+    return conditional_response(request, rendered)
+
+
+@router.get("/patients/appointments", response_model=List[AppointmentOut], tags=["Patients"])
+async def get_patient_appointments_async(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                                         stream: bool = False, db: AsyncSession = Depends(get_async_read_db),
+                                         current_patient: Principal = Depends(get_current_principal_async)):
+
+    if current_patient.role != "patient": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns patients only"
+        )
+
+    statement = select(APPOINTMENT_ROW).where(models.Appointment.patient_id == current_patient.id)
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+
+    if stream:
+        return stream_ndjson_async(db, statement, order, cursor, AppointmentOut)
+
+    patient_appointments, next_cursor = await keyset_page_async(db, statement, order, cursor, limit)
+
+    if not patient_appointments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Existing Appointments For You !")
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(APPOINTMENT_OUT_LIST, patient_appointments, response)
@@ -13,35 +13,29 @@ router = APIRouter(prefix="/login", tags=["Authentification"])
 def login(user_credentials: OAuth2PasswordRequestForm = Depends(),
            db:Session=Depends(get_db)):
 
-    patient = db.query(models.Patient).filter(models.Patient.email == user_credentials.username).first()
-
-    if not patient:
-
-        doctor = db.query(models.Doctor).filter(models.Doctor.email == user_credentials.username).first()
-
-        if not doctor:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail="Invalid Credentials")
-        
-        is_verified = utils.verify(user_credentials.password, doctor.password)
-    
-        if not is_verified:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail="Invalid Credentials")
-    
-        access_token = oauth2.create_access_token(payload={"user_id": doctor.id, "role": "doctor"})
-        print(doctor.role)
-
-        return {"access_token": access_token, "token_type": "bearer"}
-    
+    # patients and doctors share one email index through the accounts table
+    account = db.query(models.Account).filter(models.Account.email == user_credentials.username).first()
+
+    if not account:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Invalid Credentials")
+
+    user_id, role = account.user_id, account.role
+
     # Verify user's password
-    is_verified = utils.verify(user_credentials.password, patient.password)
-    
+    is_verified, new_hash = utils.verify_and_update(user_credentials.password, account.password)
+
     if not is_verified:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid Credentials")
-    
-    access_token = oauth2.create_access_token(payload={"user_id": patient.id, "role": "patient"})
-    print(patient.role)
-    
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+
+    # transparent upgrade to the configured hashing scheme and costs,
+    # the accounts row follows through its trigger
+    if new_hash:
+        user_model = oauth2.USER_MODELS[role] #type: ignore
+        db.query(user_model).filter(user_model.id == user_id).update({"password": new_hash}, synchronize_session=False)
+        db.commit()
+
+    access_token = oauth2.create_access_token(payload={"user_id": user_id, "role": role})
+
+    return {"access_token": access_token, "token_type": "bearer"}
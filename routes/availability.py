@@ -0,0 +1,78 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import select, exists, values, column, cast, true, Integer, Date, Time
+from database import get_read_db
+from schemas import AvailableSlot, AVAILABLE_SLOT_LIST
+from serialization import list_response
+from config import settings
+import models
+import datetime
+
+router = APIRouter(prefix="/availability", tags=["Availability"])
+
+
+def slot_grid(date_from: datetime.date, days: int):
+    # future (date, time) slots of the configured grid, in chronological order
+    now = datetime.datetime.now()
+    step = datetime.timedelta(minutes=settings.slot_minutes)
+    grid = []
+
+    for offset in range(days):
+        day = date_from + datetime.timedelta(days=offset)
+        if day.weekday() in settings.slot_days_off:
+            continue
+
+        slot = datetime.datetime.combine(day, settings.slot_day_start)
+        day_end = datetime.datetime.combine(day, settings.slot_day_end)
+        while slot < day_end:
+            if slot > now:
+                grid.append((day, slot.time()))
+            slot += step
+    return grid
+
+
+@router.get("/", response_model=List[AvailableSlot])
+def get_earliest_slots(specialty: Optional[str] = None, city: Optional[str] = None, postal_code: Optional[str] = None,
+                       date_from: Optional[datetime.date] = None, days: int = Query(7, ge=1, le=31),
+                       limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_read_db)):
+
+    today = datetime.date.today()
+    grid = slot_grid(max(date_from or today, today), days)
+    if not grid:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Available Slot Found !")
+
+    # doctors are stored with capitalized specialty and city (see create_doctor)
+    filters = []
+    if specialty:
+        filters.append(models.Doctor.specialty == specialty.capitalize())
+    if city:
+        filters.append(models.Doctor.city == city.capitalize())
+    if postal_code:
+        filters.append(models.Doctor.postal_code == postal_code)
+
+    slots = values(column("n", Integer), column("date", Date), column("time", Time),
+                   name="slots").data([(n, day, time) for n, (day, time) in enumerate(grid)])
+
+    # for one slot, the first free doctors matching the filters, every "is it taken"
+    # check is a single probe of the (doctor_id, date, time) index on appointments
+    free_doctors = select(models.Doctor.id, models.Doctor.first_name, models.Doctor.last_name,
+                          models.Doctor.specialty, models.Doctor.city).where(
+        *filters,
+        ~exists().where(
+            models.Appointment.doctor_id == models.Doctor.id,
+            models.Appointment.date == slots.c.date,
+            models.Appointment.time == cast(slots.c.time, Time(timezone=True)),
+        )).order_by(models.Doctor.id).limit(limit).lateral("free_doctors")
+
+    # slots are walked in chronological order and the walk stops as soon as limit rows are found
+    available_slots = db.query(
+        free_doctors.c.id.label("doctor_id"), free_doctors.c.first_name, free_doctors.c.last_name,
+        free_doctors.c.specialty, free_doctors.c.city, slots.c.date, slots.c.time
+        ).select_from(slots).join(free_doctors, true()).order_by(slots.c.n, free_doctors.c.id).limit(limit).all()
+
+    if not available_slots:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Available Slot Found !")
+    return list_response(AVAILABLE_SLOT_LIST, available_slots)
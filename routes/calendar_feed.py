@@ -0,0 +1,132 @@
+# ICALENDAR FEED OF A DOCTOR'S APPOINTMENTS
+# calendar apps subscribe to the url returned by POST /calendar/feed. sync clients send
+# back the X-Sync-Token of their previous poll as ?since= and only get the appointments
+# changed since then, deleted ones as cancelled events
+import datetime
+import hashlib
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import get_db
+from oauth2 import get_current_principal, Principal
+from schemas import CalendarFeedOut
+from pagination import sync_since, next_sync_token, SYNC_TOKEN_HEADER, STREAM_BATCH_SIZE
+from config import settings
+import models
+import ical
+
+router = APIRouter(prefix="/calendar", tags=["Calendar"])
+
+# "delta" when only changes since the token were sent, "full" otherwise
+SYNC_MODE_HEADER = "X-Sync-Mode"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@router.post("/feed", response_model=CalendarFeedOut)
+def create_feed(request: Request, db: Session=Depends(get_db),
+                current_doctor: Principal=Depends(get_current_principal)):
+
+    if current_doctor.role != "doctor": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns doctors only"
+        )
+
+    # one feed per doctor, a new token revokes the previous one
+    token = secrets.token_urlsafe(32)
+    statement = insert(models.CalendarFeed).values(token_hash=hash_token(token), doctor_id=current_doctor.id)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[models.CalendarFeed.doctor_id],
+        set_={"token_hash": statement.excluded.token_hash, "created_at": func.now()}))
+    db.commit()
+
+    return {"url": str(request.url_for("get_feed", token=token))}
+
+
+@router.delete("/feed")
+def revoke_feed(db: Session=Depends(get_db), current_doctor: Principal=Depends(get_current_principal)):
+
+    if current_doctor.role != "doctor": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns doctors only"
+        )
+
+    deleted = db.query(models.CalendarFeed).filter(models.CalendarFeed.doctor_id == current_doctor.id).delete(
+        synchronize_session=False)
+    db.commit()
+
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Calendar Feed Found !")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{token}.ics")
+def get_feed(token: str, since: Optional[str] = None, db: Session=Depends(get_db)):
+    # the token is the credential, no Authorization header: calendar apps can't send one.
+    # read from the primary: on a replica lagging more than sync_overlap, the next token would
+    # already point past writes the replica hadn't replayed yet, and they would never be sent
+    doctor_id = db.execute(select(models.CalendarFeed.doctor_id).where(
+        models.CalendarFeed.token_hash == hash_token(token))).scalar()
+    if doctor_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Calendar Feed Not Found !")
+
+    # database clock, the one updated_at and deleted_at are written with
+    now = db.execute(select(func.now())).scalar()
+    since_time = sync_since(since, now)
+    next_token = next_sync_token(now)
+
+    Appointment = models.Appointment
+    appointments = select(Appointment.id, Appointment.date, Appointment.time, Appointment.case,
+                          Appointment.confirmed, Appointment.updated_at,
+                          models.Patient.first_name, models.Patient.last_name).join(
+        models.Patient, models.Patient.id == Appointment.patient_id).where(Appointment.doctor_id == doctor_id)
+    tombstones = None
+
+    if since_time is None:
+        appointments = appointments.order_by(Appointment.date, Appointment.time, Appointment.id)
+    else:
+        # both answered by a (doctor_id, time of change) index, the cost follows the changes only
+        appointments = appointments.where(Appointment.updated_at > since_time).order_by(Appointment.updated_at)
+        tombstones = select(models.Tombstone.entity_id, models.Tombstone.starts_at, models.Tombstone.deleted_at).where(
+            models.Tombstone.doctor_id == doctor_id, models.Tombstone.entity == "appointment",
+            models.Tombstone.deleted_at > since_time).order_by(models.Tombstone.deleted_at)
+
+    bind = db.get_bind()
+    slot = datetime.timedelta(minutes=settings.slot_minutes)
+
+    def lines():
+        # dependencies with yield are closed before the body is sent, so the stream owns its session
+        yield ical.begin_calendar("FelWaqt appointments")
+        with Session(bind) as stream_db:
+            result = stream_db.execute(appointments.execution_options(stream_results=True,
+                                                                      yield_per=STREAM_BATCH_SIZE))
+            for rows in result.partitions():
+                chunk = []
+                for row in rows:
+                    start = datetime.datetime.combine(row.date, row.time)
+                    chunk.append(ical.event(f"appointment-{row.id}@felwaqt", start, start + slot,
+                                            f"{row.first_name} {row.last_name} - {row.case}", row.confirmed,
+                                            row.updated_at))
+                yield "".join(chunk)
+
+            if tombstones is not None:
+                for tombstone in stream_db.execute(tombstones):
+                    # tombstones written before starts_at existed fall back to the deletion time
+                    start = tombstone.starts_at or tombstone.deleted_at
+                    yield ical.cancelled_event(f"appointment-{tombstone.entity_id}@felwaqt", start, start + slot,
+                                               tombstone.deleted_at)
+        yield ical.end_calendar()
+
+    return StreamingResponse(lines(), media_type="text/calendar; charset=utf-8",
+                             headers={SYNC_TOKEN_HEADER: next_token,
+                                      SYNC_MODE_HEADER: "full" if since_time is None else "delta"})
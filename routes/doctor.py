@@ -1,38 +1,92 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Response
-from sqlalchemy.orm import Session
-from schemas import DoctorCreate, DoctorUpdate, DoctorOut, AppointmentOut, AppointmentsUpdate, ConfirmAppointment, PatientOut
-from database import get_db
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Query, Request
+from sqlalchemy.orm import Session, undefer_group
+from schemas import DoctorCreate, DoctorUpdate, DoctorOut, AppointmentOut, AppointmentsUpdate, ConfirmAppointment, PatientOut, FeedBackOut, DoctorDashboard
+from schemas import DOCTOR_OUT, PATIENT_OUT_LIST, APPOINTMENT_OUT_LIST, FEEDBACK_OUT_LIST
+from database import get_db, get_read_db
 import models
-from typing import List
-from sqlalchemy import or_
-from oauth2 import get_current_user
+from typing import List, Optional
+from sqlalchemy import select, func, case
+from sqlalchemy.exc import IntegrityError
+import datetime
+from oauth2 import get_current_principal, Principal
 import utils
+from pagination import keyset_page, stream_ndjson, row_bundle, NEXT_CURSOR_HEADER
+from cache import doctor_cache, search_cache, principal_cache
+from etags import render_json, conditional_response
+from serialization import list_response
+
+# fields a home search matches on, changing one of them can move a doctor into other searches
+SEARCHABLE_FIELDS = ("first_name", "last_name", "specialty", "city", "postal_code")
 
 
 router = APIRouter(prefix="/doctors", tags=["Doctors"])
 
+# read only lists fetch the serialised columns only, as plain rows
+PATIENT_ROW = row_bundle(models.Patient, PatientOut)
+APPOINTMENT_ROW = row_bundle(models.Appointment, AppointmentOut)
+FEEDBACK_ROW = row_bundle(models.FeedBack, FeedBackOut)
+
+
+def dashboard_statement(doctor_id: int, today: datetime.date, days: int):
+    # every dashboard figure in one select, each one an index range scan over the doctor's
+    # appointments, the result is one row whatever the length of the history. the rating
+    # figures are read from doctor_stats, the aggregates the profile shows too
+    Appointment = models.Appointment
+    stats = models.DoctorStat
+    of_doctor = Appointment.doctor_id == doctor_id
+
+    per_day = select(Appointment.date, func.count().label("appointments")).where(
+        of_doctor, Appointment.date.between(today, today + datetime.timedelta(days=days - 1))
+        ).group_by(Appointment.date).subquery()
+
+    return select(
+        select(func.json_object_agg(per_day.c.date, per_day.c.appointments)).scalar_subquery().label("per_day"),
+        select(func.count()).select_from(Appointment).where(
+            of_doctor, Appointment.date >= today, Appointment.confirmed.is_(False)
+            ).scalar_subquery().label("unconfirmed"),
+        select(func.count()).select_from(models.RescheduleRequest).join(
+            Appointment, models.RescheduleRequest.appointment_id == Appointment.id
+            ).where(of_doctor).scalar_subquery().label("pending_reschedules"),
+        select(func.count(Appointment.patient_id.distinct())).where(of_doctor).scalar_subquery().label("patients"),
+        func.coalesce(select(stats.rating_count).where(stats.doctor_id == doctor_id).scalar_subquery(), 0
+                      ).label("feedbacks"),
+        select(case((stats.rating_count > 0, stats.rating_avg))).where(
+            stats.doctor_id == doctor_id).scalar_subquery().label("rating_average"),
+    )
+
 @router.post("/", response_model=DoctorOut)
 def create_doctor(doctor: DoctorCreate, db: Session=Depends(get_db)):
+    # outside the try, a busy hashing pool answers 503
+    doctor.password = utils.hash(doctor.password)
+    doctor_dict = doctor.model_dump()
+    doctor_dict["first_name"] = doctor_dict["first_name"].capitalize()
+    doctor_dict["last_name"] = doctor_dict["last_name"].capitalize()
+    doctor_dict["specialty"] = doctor_dict["specialty"].capitalize()
+    doctor_dict["city"] = doctor_dict["city"].capitalize()
+
+    # emails are unique across doctors and patients (accounts table), phones and pictures within doctors
+    new_doctor = models.Doctor(**doctor_dict)
     try:
-        doctor.password = utils.hash(doctor.password)
-        doctor_dict = doctor.model_dump()
-        doctor_dict["first_name"] = doctor_dict["first_name"].capitalize()
-        doctor_dict["last_name"] = doctor_dict["last_name"].capitalize()
-        doctor_dict["specialty"] = doctor_dict["specialty"].capitalize()
-        doctor_dict["city"] = doctor_dict["city"].capitalize()
-
-        new_doctor = models.Doctor(**doctor_dict)
         db.add(new_doctor)
         db.commit()
-        db.refresh(new_doctor)
-        return new_doctor
-    except Exception:
-        print("Some Error Has Occured, Please Check Your Input Validity")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Email, phone or picture already used by another account.")
 
+    db.refresh(new_doctor)
+    # the new doctor may belong to any cached search page
+    search_cache.clear()
+    return new_doctor
+
+
+# list endpoints are paged by cursor (ordered by date, time, id), the next page cursor is sent
+# in the X-Next-Cursor header, with stream=true the whole list is sent as NDJSON instead
 
 @router.get("/patients", response_model=List[PatientOut])
-def get_doctor_patients(db: Session=Depends(get_db),
-                 current_doctor : models.Doctor=Depends(get_current_user)):
+def get_doctor_patients(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                        stream: bool = False, db: Session=Depends(get_read_db),
+                        current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -40,38 +94,56 @@ def get_doctor_patients(db: Session=Depends(get_db),
             detail="Method concerns doctors only"
         )
 
-    doctor_appointments = db.query(models.Appointment).filter(models.Appointment.doctor_id == current_doctor.id).all()
-    doctor_patients_ids = [appointment.patient_id for appointment in doctor_appointments]
+    doctor_patients_ids = db.query(models.Appointment.patient_id).filter(models.Appointment.doctor_id == current_doctor.id)
+    patients_query = db.query(PATIENT_ROW).filter(models.Patient.id.in_(doctor_patients_ids))
+    order = [models.Patient.id]
+
+    if stream:
+        return stream_ndjson(patients_query, order, cursor, PatientOut)
 
-    doctor_patients = db.query(models.Patient).filter(models.Patient.id.in_(doctor_patients_ids)).all()
+    doctor_patients, next_cursor = keyset_page(patients_query, order, cursor, limit)
 
     if not doctor_patients:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"No Patient Has Been Found!")
-    return doctor_patients
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(PATIENT_OUT_LIST, doctor_patients, response)
 
 
 @router.get("/appointments", response_model=List[AppointmentOut])
-def get_appointments(db: Session=Depends(get_db), current_doctor: models.Doctor=Depends(get_current_user)):
-    print (current_doctor.role, type(current_doctor.role))
+def get_appointments(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                     stream: bool = False, db: Session=Depends(get_read_db),
+                     current_doctor: Principal=Depends(get_current_principal)):
+
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Method concerns doctors only"
         )
 
-    doctor_appointments = db.query(models.Appointment).filter(models.Appointment.doctor_id == current_doctor.id).all()
+    appointments_query = db.query(APPOINTMENT_ROW).filter(models.Appointment.doctor_id == current_doctor.id)
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+
+    if stream:
+        return stream_ndjson(appointments_query, order, cursor, AppointmentOut)
+
+    doctor_appointments, next_cursor = keyset_page(appointments_query, order, cursor, limit)
 
     if not doctor_appointments:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No Existing Appointments For You !")
 
-    return doctor_appointments
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(APPOINTMENT_OUT_LIST, doctor_appointments, response)
 
 
-@router.get("/feedbacks")
-def get_feedbacks(db: Session=Depends(get_db),
-                  current_doctor:models.Doctor=Depends(get_current_user)):
+@router.get("/feedbacks", response_model=List[FeedBackOut])
+def get_feedbacks(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                  stream: bool = False, db: Session=Depends(get_read_db),
+                  current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -79,33 +151,76 @@ def get_feedbacks(db: Session=Depends(get_db),
             detail="Method concerns doctors only"
         )
 
-    doctor_appointments = db.query(models.Appointment).filter(models.Appointment.doctor_id == current_doctor.id).all()
+    feedbacks_query = db.query(FEEDBACK_ROW).join(
+        models.Appointment, models.FeedBack.appointment_id == models.Appointment.id
+        ).filter(models.Appointment.doctor_id == current_doctor.id)
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
 
-    if not doctor_appointments:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail="No Appointments Found !")
+    if stream:
+        return stream_ndjson(feedbacks_query, order, cursor, FeedBackOut)
 
-    feedbacks = db.query(models.FeedBack).filter(models.FeedBack.appointment_id.in_(doctor_appointments)).all()
+    feedbacks, next_cursor = keyset_page(feedbacks_query, order, cursor, limit)
 
     if not feedbacks:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No Feedbacks Found !")
-    
-    return feedbacks
 
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(FEEDBACK_OUT_LIST, feedbacks, response)
 
-@router.get("/{id}", response_model=DoctorOut)
-def get_doctor(id: int, db: Session=Depends(get_db)):
-    doctor = db.query(models.Doctor).filter(models.Doctor.id == id).first()
-    if not doctor:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Doctor with id: {id} not found!")
-    return doctor
 
+@router.get("/dashboard", response_model=DoctorDashboard)
+def get_dashboard(days: int = Query(7, ge=1, le=31), db: Session=Depends(get_read_db),
+                  current_doctor: Principal=Depends(get_current_principal)):
+
+    if current_doctor.role != "doctor": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns doctors only"
+        )
 
-@router.delete("/{id}")
+    today = datetime.date.today()
+    summary = db.execute(dashboard_statement(current_doctor.id, today, days)).one()
+
+    # days without appointments are missing from the aggregate
+    per_day = summary.per_day or {}
+    upcoming = []
+    for n in range(days):
+        day = today + datetime.timedelta(days=n)
+        upcoming.append({"date": day, "appointments": per_day.get(day.isoformat(), 0)})
+
+    return {
+        "upcoming": upcoming,
+        "unconfirmed": summary.unconfirmed,
+        "pending_reschedules": summary.pending_reschedules,
+        "patients": summary.patients,
+        "feedbacks": summary.feedbacks,
+        "rating_average": round(float(summary.rating_average), 2) if summary.rating_average is not None else None,
+    }
+
+
+@router.get("/{id:int}", response_model=DoctorOut)
+def get_doctor(id: int, request: Request, db: Session=Depends(get_db)):
+    # a cache hit, and the 304 answered from it, never touches the database. misses are read
+    # from the primary: a replica could put back, for every client and the whole ttl, the
+    # version a write just invalidated
+    rendered = doctor_cache.get(id)
+    if rendered is None:
+        doctor = db.query(models.Doctor).options(undefer_group("rating")).filter(models.Doctor.id == id).first()
+        if not doctor:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Doctor with id: {id} not found!")
+
+        rendered = render_json(DOCTOR_OUT, DoctorOut.model_validate(doctor, from_attributes=True))
+        doctor_cache.set(id, rendered)
+
+    return conditional_response(request, rendered)
+
+
+@router.delete("/{id:int}")
 def delete_doctor(id: int, db: Session=Depends(get_db),
-                  current_doctor: models.Doctor=Depends(get_current_user)):
+                  current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -126,12 +241,15 @@ def delete_doctor(id: int, db: Session=Depends(get_db),
     
     doctor_query.delete(synchronize_session=False)
     db.commit()
+    principal_cache.invalidate(("doctor", id))
+    doctor_cache.invalidate(id)
+    search_cache.invalidate_tag(id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.patch("/{id}", response_model=DoctorOut)
+@router.patch("/{id:int}", response_model=DoctorOut)
 def update_doctor(id: int, new_doctor: DoctorUpdate, db:Session=Depends(get_db),
-                  current_doctor:models.Doctor=Depends(get_current_user)):
+                  current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -158,8 +276,22 @@ def update_doctor(id: int, new_doctor: DoctorUpdate, db:Session=Depends(get_db),
         doctor_dict["city"] = doctor_dict["city"].capitalize()
     except Exception:
         print ("There we some empty fields.")
-    doctor_query.update(doctor_dict, synchronize_session=False) #type: ignore
-    db.commit()
+    # emails are unique across doctors and patients (accounts table), phones and pictures within each table
+    try:
+        doctor_query.update(doctor_dict, synchronize_session=False) #type: ignore
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Email, phone or picture already used by another account.")
+
+    principal_cache.invalidate(("doctor", id))
+    doctor_cache.invalidate(id)
+    if any(field in doctor_dict for field in SEARCHABLE_FIELDS):
+        search_cache.clear()
+    else:
+        search_cache.invalidate_tag(id)
+
     db.refresh(doctor)
     return doctor
 
@@ -167,7 +299,7 @@ def update_doctor(id: int, new_doctor: DoctorUpdate, db:Session=Depends(get_db),
 
 @router.patch("/appointments/{appointment_id}", response_model=AppointmentOut)
 def update_appointment(appointment_id: int, new_appointment: AppointmentsUpdate, db:Session=Depends(get_db), 
-                       current_doctor:models.Doctor=Depends(get_current_user)):
+                       current_doctor: Principal=Depends(get_current_principal)):
         
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -184,28 +316,25 @@ def update_appointment(appointment_id: int, new_appointment: AppointmentsUpdate,
     if bool(target_appointment.doctor_id != current_doctor.id):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="You aren't part of this appointment !")
-        
-    all_appointments = db.query(models.Appointment).filter(or_(models.Appointment.doctor_id == current_doctor.id,
-                                                               models.Appointment.patient_id == target_appointment.patient_id)).all()
-    
+
     new_appointment_dict = new_appointment.model_dump(exclude_none=True)
 
-    for appointment in all_appointments:
+    # a slot already taken by the doctor or the patient violates a unique constraint
+    try:
+        target_appointment_query.update(new_appointment_dict) # type: ignore
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Can not use update appointment to this time and date, please change.")
 
-        if (appointment.date == new_appointment_dict.get("date") and
-            appointment.time == new_appointment_dict.get("time")):
-            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED,
-                                detail="Can not use update appointment to this time and date, please change.")
-    print("here")
-    target_appointment_query.update(new_appointment_dict) # type: ignore
-    db.commit()
     db.refresh(target_appointment)
     return target_appointment
 
 
 @router.delete("/appointments/{appointment_id}")
 def delete_appointment(appointment_id: int, db: Session=Depends(get_db),
-                       current_doctor=Depends(get_current_user)):
+                       current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -234,7 +363,7 @@ def delete_appointment(appointment_id: int, db: Session=Depends(get_db),
 
 @router.post("/appointments/{appointment_id}")
 def confirm_or_done_appointment(appointment_id: int, confirm_or_done: ConfirmAppointment, db:Session=Depends(get_db),
-                     current_doctor: models.Doctor=Depends(get_current_user)):
+                     current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -265,7 +394,7 @@ def confirm_or_done_appointment(appointment_id: int, confirm_or_done: ConfirmApp
 
 @router.post("/reschedules/{appointment_id}")
 def confirm_reschedule(appointment_id: int, db:Session=Depends(get_db),
-                     current_doctor: models.Doctor=Depends(get_current_user)):
+                     current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -293,16 +422,22 @@ def confirm_reschedule(appointment_id: int, db:Session=Depends(get_db),
     
     appointment.date = reschedule.new_date
     appointment.time = reschedule.new_time
-    reschedule_query.delete(synchronize_session=False)
-    
-    db.commit()
+
+    # the new slot may have been booked since the request was made
+    try:
+        reschedule_query.delete(synchronize_session=False)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Cannot occupy this date and time slot, change it please.")
 
     return Response(status_code=status.HTTP_202_ACCEPTED)
 
 
 @router.delete("/reschedules/{appointment_id}")
 def reject_reschedule(appointment_id: int, db: Session=Depends(get_db),
-                       current_doctor=Depends(get_current_user)):
+                       current_doctor: Principal=Depends(get_current_principal)):
     
     if current_doctor.role != "doctor": #type: ignore
         raise HTTPException(
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Response, status
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from database import engine, async_engine, replica_engines, async_replica_engines
+from cache import doctor_cache, search_cache, principal_cache
+import metrics
+
+router = APIRouter(tags=["Health"])
+
+@router.get("/health/cache")
+def get_cache_stats():
+    return {"doctors": doctor_cache.stats(), "search": search_cache.stats(),
+            "principals": principal_cache.stats()}
+
+
+@router.get("/health/ready")
+def get_readiness(response: Response):
+    # ready when postgres answers, with the live pool stats either way.
+    # the check waits for a pooled connection like any request, a saturated pool shows up as slow
+    pools = {"sync": metrics.pool_stats(engine.pool)}
+    if async_engine is not None:
+        pools["async"] = metrics.pool_stats(async_engine.pool)
+    for n, replica in enumerate(replica_engines):
+        pools[f"replica-{n}"] = metrics.pool_stats(replica.pool)
+    for n, replica in enumerate(async_replica_engines):
+        pools[f"async-replica-{n}"] = metrics.pool_stats(replica.pool)
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except SQLAlchemyError as exc:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"ready": False, "error": exc.__class__.__name__, "pools": pools}
+
+    return {"ready": True, "pools": pools}
+
+
+@router.get("/metrics")
+def get_metrics():
+    content, media_type = metrics.latest()
+    return Response(content=content, media_type=media_type)
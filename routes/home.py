@@ -1,27 +1,108 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Literal, NamedTuple
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 import models
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer_group
 from database import get_db
-from sqlalchemy import or_
-from schemas import DoctorOut
+from sqlalchemy import or_, and_, func, select, tuple_, cast
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from schemas import DoctorOut, DOCTOR_OUT_LIST
+from pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from cache import search_cache
+from etags import RenderedJSON, render_json, conditional_response
 
 router = APIRouter(tags=["Home"])
 
-@router.get("/", response_model=List[DoctorOut])
-def get_doctors(search: str = "", db: Session = Depends(get_db)):
-    search = search.capitalize()
-
-    doctors = db.query(models.Doctor).filter(
-        or_(
-        models.Doctor.first_name.contains(search),
-        models.Doctor.last_name.contains(search),
-        models.Doctor.city.contains(search),
-        models.Doctor.specialty.contains(search),
+
+def search_filter(search: str):
+    # "<%" (word similarity) and LIKE are both answered by the trigram index on search_text,
+    # % and _ typed by the user are matched literally
+    term = func.f_unaccent(search)
+    pattern = func.f_unaccent(search.replace("/", "//").replace("%", "/%").replace("_", "/_"))
+    return term, or_(
+        term.op("<%")(models.Doctor.search_text),
+        models.Doctor.search_text.contains(pattern, escape="/"),
         models.Doctor.postal_code == search,
         )
-        ).all()
-    if not doctors:
+
+
+def search_statement(search: str, limit: int, cursor: Optional[str], sort: str = "relevance"):
+    # rows are (doctor,) for an empty search, (doctor, rank) otherwise and (doctor, rating
+    # average, rating count) sorted by rating, one row more than the page size tells whether
+    # a next page exists. the doctors come with their deferred rating, DoctorOut sends it
+    if sort == "rating":
+        # best rated first, then most rated, walking ix_doctor_stats_rating backwards
+        stats = models.DoctorStat
+        statement = select(models.Doctor, stats.rating_avg, stats.rating_count).join(
+            stats, stats.doctor_id == models.Doctor.id).options(undefer_group("rating"))
+        if search:
+            statement = statement.where(search_filter(search)[1])
+        if cursor:
+            statement = statement.where(tuple_(stats.rating_avg, stats.rating_count, stats.doctor_id)
+                                        < tuple_(*decode_cursor(cursor, 3)))
+        return statement.order_by(stats.rating_avg.desc(), stats.rating_count.desc(),
+                                  stats.doctor_id.desc()).limit(limit + 1)
+
+    if not search:
+        statement = select(models.Doctor).options(undefer_group("rating"))
+        if cursor:
+            (last_id,) = decode_cursor(cursor, 1)
+            statement = statement.where(models.Doctor.id > last_id)
+        return statement.order_by(models.Doctor.id).limit(limit + 1)
+
+    term, matches = search_filter(search)
+    # word_similarity() is a real, the cursor carries a double: ranking on the double makes the
+    # rank sent back in the cursor compare equal to the row it came from
+    rank = cast(func.word_similarity(term, models.Doctor.search_text), DOUBLE_PRECISION)
+    statement = select(models.Doctor, rank).where(matches).options(undefer_group("rating"))
+
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, 2)
+        statement = statement.where(or_(rank < last_rank,
+                                        and_(rank == last_rank, models.Doctor.id > last_id)))
+    return statement.order_by(rank.desc(), models.Doctor.id).limit(limit + 1)
+
+
+class SearchPage(NamedTuple):
+    rendered: RenderedJSON
+    doctor_ids: List[int]
+    next_cursor: Optional[str]
+
+
+def search_page(rows, limit: int):
+    # one page of DoctorOut rendered to json, with the cursor of the next page (None on the last one)
+    next_cursor = None
+    if len(rows) > limit:
+        last_row = rows[limit - 1]
+        next_cursor = encode_cursor(*last_row[1:], last_row[0].id)
+    doctors = [DoctorOut.model_validate(row[0], from_attributes=True) for row in rows[:limit]]
+    return SearchPage(render_json(DOCTOR_OUT_LIST, doctors), [doctor.id for doctor in doctors], next_cursor)
+
+
+def send_page(request: Request, page: SearchPage):
+    if not page.doctor_ids:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No Doctor Has Been Found!")
-    return doctors
\ No newline at end of file
+
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    return conditional_response(request, page.rendered, headers)
+
+
+@router.get("/", response_model=List[DoctorOut])
+def get_doctors(request: Request, search: str = "", limit: int = Query(20, ge=1, le=100),
+                cursor: Optional[str] = None, sort: Literal["relevance", "rating"] = "relevance",
+                db: Session = Depends(get_db)):
+    # search_text is lower cased and unaccented by the database,
+    # the search term goes through the same normalisation
+    search = search.strip().lower()
+
+    # the session only checks out a pool connection on its first query,
+    # so a cache hit, and the 304 answered from it, never touches the database. misses are
+    # read from the primary, a replica could re-cache results a write just invalidated
+    key = (search, limit, cursor, sort)
+    page = search_cache.get(key)
+    if page is None:
+        rows = db.execute(search_statement(search, limit, cursor, sort)).all()
+        page = search_page(rows, limit)
+        search_cache.set(key, page, tags=page.doctor_ids)
+
+    return send_page(request, page)
\ No newline at end of file
@@ -1,37 +1,74 @@
 from fastapi.routing import APIRouter
 import models
-from schemas import PatientCreate, PatientOut, PatientUpdate, AppointmentCreate, AppointmentOut, Reschedule, FeedBack
-from fastapi import Depends, HTTPException, status, Response
-from database import get_db
+from schemas import PatientCreate, PatientOut, PatientUpdate, AppointmentCreate, AppointmentOut, Reschedule, RescheduleOut, FeedBack, FeedBackOut
+from schemas import APPOINTMENT_OUT_LIST, RESCHEDULE_OUT_LIST, FEEDBACK_OUT_LIST
+from fastapi import Depends, HTTPException, status, Response, Query
+from database import get_db, get_read_db
 from sqlalchemy.orm import Session
-from typing import List
-from oauth2 import get_current_user
-from sqlalchemy import or_, and_
+from typing import List, Optional
+from oauth2 import get_current_principal, Principal
+from sqlalchemy import or_, and_, select, exists, literal, values, column, cast, Integer, Date, Time
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 import utils
 import datetime
+from pagination import keyset_page, stream_ndjson, row_bundle, NEXT_CURSOR_HEADER
+from cache import principal_cache, doctor_cache, search_cache
+from serialization import list_response
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
+# read only lists fetch the serialised columns only, as plain rows
+APPOINTMENT_ROW = row_bundle(models.Appointment, AppointmentOut)
+RESCHEDULE_ROW = row_bundle(models.RescheduleRequest, RescheduleOut)
+FEEDBACK_ROW = row_bundle(models.FeedBack, FeedBackOut)
+
+# most appointments booked by one batch request
+MAX_BATCH_APPOINTMENTS = 50
+
+# postgres error codes
+UNIQUE_VIOLATION = "23505"
+
+# foreign key of a booked appointment to its patient, named by postgres
+PATIENT_FOREIGN_KEY = "appointments_patient_id_fkey"
+
+
+def unknown_account_error(exc: IntegrityError, doctor_id: int, patient_id: int) -> HTTPException:
+    # a foreign key of the new appointments failed: either the doctor doesn't exist, or the
+    # patient was deleted by another worker while its principal was still cached here
+    if getattr(getattr(exc.orig, "diag", None), "constraint_name", None) == PATIENT_FOREIGN_KEY:
+        principal_cache.invalidate(("patient", patient_id))
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                         detail=f"Doctor with id: {doctor_id} doesn't exists.")
+
 
 @router.post("/", response_model=PatientOut)
 def create_patient(patient: PatientCreate, db: Session=Depends(get_db)):
+    # outside the try, a busy hashing pool answers 503
+    patient.password = utils.hash(patient.password)
+    patient_dict = patient.model_dump(exclude_none=True)
+    patient_dict["first_name"] = patient_dict["first_name"].capitalize()
+    patient_dict["last_name"] = patient_dict["last_name"].capitalize()
+
+    # emails are unique across doctors and patients (accounts table), phones within patients
+    new_patient = models.Patient(**patient_dict)
     try:
-        patient.password = utils.hash(patient.password)
-        patient_dict = patient.model_dump(exclude_none=True)
-        patient_dict["first_name"] = patient_dict["first_name"].capitalize()
-        patient_dict["last_name"] = patient_dict["last_name"].capitalize()
-        new_patient = models.Patient(**patient_dict)
         db.add(new_patient)
         db.commit()
-        db.refresh(new_patient)
-        return new_patient
-    except Exception:
-        print("Some Error Has Occured, Please Check Your Input Validity")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Email or phone already used by another account.")
+
+    db.refresh(new_patient)
+    return new_patient
 
 
 @router.delete("/appointments/{appointment_id}")
 def delete_appointment(appointment_id: int, db: Session=Depends(get_db),
-                       current_patient=Depends(get_current_user)):
+                       current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
         raise HTTPException(
@@ -60,7 +97,7 @@ def delete_appointment(appointment_id: int, db: Session=Depends(get_db),
 
 @router.delete("/{patient_id}")
 def delete_patient(patient_id: int, db: Session=Depends(get_db),
-                   current_patient : models.Patient=Depends(get_current_user)):
+                   current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
         raise HTTPException(
@@ -80,14 +117,22 @@ def delete_patient(patient_id: int, db: Session=Depends(get_db),
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No user found !")
  
+    # the patient's feedbacks go with the cascade, and with them part of these doctors' ratings
+    rated_doctors = db.execute(select(models.Appointment.doctor_id).join(
+        models.FeedBack, models.FeedBack.appointment_id == models.Appointment.id).where(
+        models.Appointment.patient_id == patient_id, models.FeedBack.rating.isnot(None)).distinct()).scalars().all()
+
     patient_query.delete(synchronize_session=False)
     db.commit()
+    principal_cache.invalidate(("patient", patient_id))
+    for doctor_id in rated_doctors:
+        forget_doctor_rating(doctor_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.patch("/{patient_id}", response_model=PatientOut)
 def update_patient(patient_id: int, new_patient: PatientUpdate, db:Session=Depends(get_db),
-                   current_patient: models.Patient = Depends(get_current_user)):
+                   current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
         raise HTTPException(
@@ -116,15 +161,22 @@ def update_patient(patient_id: int, new_patient: PatientUpdate, db:Session=Depen
     except Exception:
         print ("Some Fields were empty")
     
-    patient_query.update(patient_dict, synchronize_session=False) #type: ignore
-    db.commit()
+    # emails are unique across patients and doctors (accounts table), phones within each table
+    try:
+        patient_query.update(patient_dict, synchronize_session=False) #type: ignore
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Email or phone already used by another account.")
+    principal_cache.invalidate(("patient", patient_id))
     db.refresh(patient)
     return patient
 
 
 @router.post("/appointments/{doctor_id}", response_model=AppointmentOut)
 def create_appointment(doctor_id: int, appointment: AppointmentCreate, db: Session=Depends(get_db),
-                       current_patient: models.Patient=Depends(get_current_user)):
+                       current_patient: Principal=Depends(get_current_principal)):
         
         if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -132,36 +184,109 @@ def create_appointment(doctor_id: int, appointment: AppointmentCreate, db: Sessi
                 detail="Method concerns patients only"
             )
         
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
-        if not doctor:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f"Doctor with id: {doctor_id} doesn't exists.")
-
-        similar_appointments = db.query(models.Appointment).filter(and_(
-            models.Appointment.date == appointment.date,
-            models.Appointment.time == appointment.time,
+        appointment_dict = appointment.model_dump(exclude_none=True)
+        appointment_dict["patient_id"] = current_patient.id
+        appointment_dict["doctor_id"] = doctor_id
+
+        # the unique (doctor_id, date, time) and (patient_id, date, time) constraints
+        # decide conflicts, so concurrent bookings of a slot can't both succeed
+        try:
+            new_appointment = db.scalars(
+                insert(models.Appointment).values(**appointment_dict)
+                .on_conflict_do_nothing()
+                .returning(models.Appointment)
+                ).first()
+            # read before commit expires the instance
+            booked_appointment = AppointmentOut.model_validate(new_appointment, from_attributes=True) if new_appointment else None
+            db.commit()
+        except IntegrityError as exc:
+            # slot conflicts are skipped, only a foreign key can fail here
+            db.rollback()
+            raise unknown_account_error(exc, doctor_id, current_patient.id)
+
+        if booked_appointment is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Cannot occupy this date and time slot, change it please.")
+        return booked_appointment
+
+
+# books a series of appointments with one doctor, all of them or none
+@router.post("/appointments/{doctor_id}/batch", response_model=List[AppointmentOut])
+def create_appointments(doctor_id: int, appointments: List[AppointmentCreate], db: Session=Depends(get_db),
+                        current_patient: Principal=Depends(get_current_principal)):
+
+    if current_patient.role != "patient": #type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Method concerns patients only"
+        )
+
+    if not appointments or len(appointments) > MAX_BATCH_APPOINTMENTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Send between 1 and {MAX_BATCH_APPOINTMENTS} appointments.")
+
+    conflicts = []
+    first_index = {}
+    for index, appointment in enumerate(appointments):
+        slot = (appointment.date, appointment.time)
+        if slot in first_index:
+            conflicts.append({"index": index, "date": appointment.date.isoformat(), "time": appointment.time.isoformat(),
+                              "reason": f"Same slot as appointment {first_index[slot]} of the batch."})
+        else:
+            first_index[slot] = index
+
+    # every requested slot checked against both calendars in one query
+    requested = values(column("index", Integer), column("date", Date), column("time", Time),
+                       name="requested").data([(index, appointment.date, appointment.time)
+                                               for index, appointment in enumerate(appointments)])
+    taken_slots = db.query(requested.c.index, models.Appointment.doctor_id).join(
+        models.Appointment, and_(
+            models.Appointment.date == requested.c.date,
+            models.Appointment.time == cast(requested.c.time, Time(timezone=True)),
             or_(
             models.Appointment.doctor_id == doctor_id,
             models.Appointment.patient_id == current_patient.id
             ))).all()
 
-        if similar_appointments:
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
-                                detail="Cannot occupy this date and time slot, change it please.")
-        
+    for index, taken_by_doctor_id in taken_slots:
+        appointment = appointments[index]
+        reason = "The doctor is not available." if taken_by_doctor_id == doctor_id else "You already have an appointment."
+        conflicts.append({"index": index, "date": appointment.date.isoformat(), "time": appointment.time.isoformat(), "reason": reason})
+
+    if conflicts:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail={"message": "Cannot occupy these date and time slots, change them please.",
+                                    "conflicts": sorted(conflicts, key=lambda conflict: conflict["index"])})
+
+    appointment_dicts = []
+    for appointment in appointments:
         appointment_dict = appointment.model_dump(exclude_none=True)
         appointment_dict["patient_id"] = current_patient.id
         appointment_dict["doctor_id"] = doctor_id
+        appointment_dicts.append(appointment_dict)
 
-        new_appointment = models.Appointment(**appointment_dict)
-        db.add(new_appointment)
+    # one transaction, a slot taken since the check fails the whole batch on the unique constraints
+    try:
+        new_appointments = db.scalars(insert(models.Appointment).returning(models.Appointment), appointment_dicts).all()
+        booked_appointments = [AppointmentOut.model_validate(appointment, from_attributes=True)
+                               for appointment in new_appointments]
         db.commit()
-        db.refresh(new_appointment)
-        return new_appointment
+    except IntegrityError as exc:
+        db.rollback()
+        if getattr(exc.orig, "pgcode", None) == UNIQUE_VIOLATION:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Cannot occupy these date and time slots, change them please.")
+        raise unknown_account_error(exc, doctor_id, current_patient.id)
+
+    return booked_appointments
 
 
+# paged by cursor (ordered by date, time, id), the next page cursor is sent in the
+# X-Next-Cursor header, with stream=true the whole list is sent as NDJSON instead
 @router.get("/appointments", response_model=List[AppointmentOut])
-def get_appointments(db: Session=Depends(get_db), current_patient: models.Patient=Depends(get_current_user)):
+def get_appointments(response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                     stream: bool = False, db: Session=Depends(get_read_db),
+                     current_patient: Principal=Depends(get_current_principal)):
 
     if current_patient.role != "patient": #type: ignore
         raise HTTPException(
@@ -169,17 +294,25 @@ def get_appointments(db: Session=Depends(get_db), current_patient: models.Patien
             detail="Method concerns patients only"
         )
 
-    patient_appointments = db.query(models.Appointment).filter(models.Appointment.patient_id == current_patient.id).all()
+    appointments_query = db.query(APPOINTMENT_ROW).filter(models.Appointment.patient_id == current_patient.id)
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+
+    if stream:
+        return stream_ndjson(appointments_query, order, cursor, AppointmentOut)
+
+    patient_appointments, next_cursor = keyset_page(appointments_query, order, cursor, limit)
 
     if not patient_appointments:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No Existing Appointments For You !")
 
-    return patient_appointments
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(APPOINTMENT_OUT_LIST, patient_appointments, response)
 
 
-@router.get("/reschedules")
-def get_reschedules(db: Session=Depends(get_db), current_patient: models.Patient=Depends(get_current_user)):
+@router.get("/reschedules", response_model=List[RescheduleOut])
+def get_reschedules(db: Session=Depends(get_read_db), current_patient: Principal=Depends(get_current_principal)):
 
     if current_patient.role != "patient": #type: ignore
         raise HTTPException(
@@ -187,25 +320,42 @@ def get_reschedules(db: Session=Depends(get_db), current_patient: models.Patient
             detail="Method concerns patients only"
         )
 
-    reschedules = []
+    reschedules = db.query(RESCHEDULE_ROW).join(
+        models.Appointment, models.RescheduleRequest.appointment_id == models.Appointment.id
+        ).filter(models.Appointment.patient_id == current_patient.id).order_by(
+            models.Appointment.date, models.Appointment.time, models.Appointment.id).all()
 
-    appointments = db.query(models.Appointment).filter(models.Appointment.patient_id == current_patient.id).all()
+    if not reschedules:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No Existing Reschedules For You !")
 
-    for app in appointments:
-        reschedule = db.query(models.RescheduleRequest).filter(models.RescheduleRequest.appointment_id == app.id).first()
-        if reschedule:
-            reschedules.append(reschedule)
+    return list_response(RESCHEDULE_OUT_LIST, reschedules)
 
-    if not reschedules:
+
+@router.get("/feedbacks", response_model=List[FeedBackOut])
+def get_feedbacks(db: Session=Depends(get_read_db), current_patient: Principal=Depends(get_current_principal)):
+
+    if current_patient.role != "patient": #type: ignore
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Method concerns patients only"
+            )
+
+    feedbacks = db.query(FEEDBACK_ROW).join(
+        models.Appointment, models.FeedBack.appointment_id == models.Appointment.id
+        ).filter(models.Appointment.patient_id == current_patient.id).order_by(
+            models.Appointment.date, models.Appointment.time, models.Appointment.id).all()
+
+    if not feedbacks:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No Existing Reschedules For You !")
 
-    return reschedules
+    return list_response(FEEDBACK_OUT_LIST, feedbacks)
 
 
 @router.get("/{patient_id}", response_model=PatientOut)
-def get_patient(patient_id:int, db: Session=Depends(get_db),
-                 current_patient : models.Patient=Depends(get_current_user)):
+def get_patient(patient_id:int, db: Session=Depends(get_read_db),
+                 current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -226,10 +376,10 @@ def get_patient(patient_id:int, db: Session=Depends(get_db),
 
 # ----------------- Reschedules for Patients -----------------
 
-@router.post("/reschedules/{appointment_id}")
+@router.post("/reschedules/{appointment_id}", response_model=RescheduleOut)
 def reschedule_appointment(appointment_id: int, reschedule:Reschedule,
                            db:Session=Depends(get_db),
-                           current_patient: models.Patient=Depends(get_current_user)):
+                           current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -243,6 +393,38 @@ def reschedule_appointment(appointment_id: int, reschedule:Reschedule,
     if reschedule.new_date == datetime.datetime.utcnow().date() and reschedule.new_time <= datetime.datetime.utcnow().time():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="New time must be in the future.")
     
+    # one statement: the request is only written when the appointment belongs to the patient
+    # and the new slot is free for both sides, an existing request keeps its old date and time.
+    # the slot is finally claimed by confirm_reschedule against the unique constraints
+    conflicting = aliased(models.Appointment)
+    requested_slot = select(
+        models.Appointment.id, models.Appointment.date, models.Appointment.time,
+        literal(reschedule.new_date, Date), literal(reschedule.new_time, Time)
+        ).where(
+            models.Appointment.id == appointment_id,
+            models.Appointment.patient_id == current_patient.id,
+            ~exists().where(
+                conflicting.date == reschedule.new_date,
+                conflicting.time == reschedule.new_time,
+                or_(
+                conflicting.doctor_id == models.Appointment.doctor_id,
+                conflicting.patient_id == current_patient.id
+                )))
+
+    upsert = insert(models.RescheduleRequest).from_select(
+        ["appointment_id", "old_date", "old_time", "new_date", "new_time"], requested_slot)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[models.RescheduleRequest.appointment_id],
+        set_={"new_date": upsert.excluded.new_date, "new_time": upsert.excluded.new_time})
+
+    saved_reschedule = db.scalars(upsert.returning(models.RescheduleRequest)).first()
+    if saved_reschedule:
+        new_reschedule = RescheduleOut.model_validate(saved_reschedule, from_attributes=True)
+        db.commit()
+        return new_reschedule
+
+    # nothing written, find out why
+    db.rollback()
     appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
 
     if not appointment:
@@ -252,51 +434,14 @@ def reschedule_appointment(appointment_id: int, reschedule:Reschedule,
     if appointment.patient_id != current_patient.id: #type:ignore
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="You aren't part of this appointment !")
-    
-    reschedule_query = db.query(models.RescheduleRequest).filter(models.RescheduleRequest.appointment_id == appointment_id)
-    existing_reschedule = reschedule_query.first()
-
-    reschedule_dict = reschedule.model_dump(exclude_none=True)
 
-    similar_appointments = db.query(models.Appointment).filter(and_(
-            models.Appointment.date == reschedule_dict["new_date"],
-            models.Appointment.time == reschedule_dict["new_time"],
-            or_(
-            models.Appointment.doctor_id == appointment.doctor_id,
-            models.Appointment.patient_id == current_patient.id
-            ))).all()
-    
-    if similar_appointments:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
-                            detail="Cannot occupy this date and time slot, change it please.")
-
-    if existing_reschedule:
-        reschedule_dict["old_date"] = existing_reschedule.old_date
-        reschedule_dict["old_time"] = existing_reschedule.old_time
-        reschedule_query.update(reschedule_dict, synchronize_session=False) #type: ignore
-        db.commit()
-        db.refresh(existing_reschedule)
-        return existing_reschedule
-    
-    reschedule_dict["appointment_id"] = appointment_id
-    reschedule_dict["old_date"] = appointment.date
-    reschedule_dict["old_time"] = appointment.time
-
-    new_reschedule = models.RescheduleRequest(**reschedule_dict)
-
-    try:
-        db.add(new_reschedule)
-        db.commit()
-        db.refresh(new_reschedule)
-    except Exception:
-        return Response(status_code=status.HTTP_417_EXPECTATION_FAILED)
-    
-    return new_reschedule
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                        detail="Cannot occupy this date and time slot, change it please.")
 
 
 @router.delete("/reschedules/{appointment_id}")
 def delete_reschedule(appointment_id: int, db:Session=Depends(get_db),
-                      current_patient: models.Patient=Depends(get_current_user)):
+                      current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -327,9 +472,16 @@ def delete_reschedule(appointment_id: int, db:Session=Depends(get_db),
 
 # ------------- Patient FeedBack -------------
 
+def forget_doctor_rating(doctor_id: int):
+    # the cached profile and search pages show the rating, cached rating sorted
+    # pages the doctor moves into only catch up once the search cache ttl runs out
+    doctor_cache.invalidate(doctor_id)
+    search_cache.invalidate_tag(doctor_id)
+
+
 @router.post("/feedbacks/{appointment_id}")
 def add_feedback(appointment_id: int, feedback: FeedBack, db:Session=Depends(get_db),
-                 current_patient:models.Patient=Depends(get_current_user)):
+                 current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -347,18 +499,21 @@ def add_feedback(appointment_id: int, feedback: FeedBack, db:Session=Depends(get
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="You aren't part of this appointment !")
     
+    doctor_id = appointment.doctor_id
     feedback_dict = feedback.model_dump(exclude_none=True)
     feedback_dict["appointment_id"] = appointment_id
     new_feedback = models.FeedBack(**feedback_dict)
     db.add(new_feedback)
+    # doctor_stats is updated by a trigger in the same transaction
     db.commit()
     db.refresh(new_feedback)
+    forget_doctor_rating(doctor_id)
     return new_feedback
 
 
 @router.delete("/feedbacks/{appointment_id}")
 def remove_feedback(appointment_id: int, db:Session=Depends(get_db),
-                 current_patient:models.Patient=Depends(get_current_user)):
+                 current_patient: Principal=Depends(get_current_principal)):
     
     if current_patient.role != "patient": #type: ignore
             raise HTTPException(
@@ -383,30 +538,9 @@ def remove_feedback(appointment_id: int, db:Session=Depends(get_db),
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="FeedBack Not Found !")
     
+    doctor_id = appointment.doctor_id
     feedback_query.delete(feedback, synchronize_session=False) # type:ignore
     db.commit()
+    forget_doctor_rating(doctor_id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
-
-
-@router.get("/feedbacks", response_model=List[FeedBack])
-def get_feedbacks(db: Session=Depends(get_db), current_patient: models.Patient=Depends(get_current_user)):
-
-    if current_patient.role != "patient": #type: ignore
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Method concerns patients only"
-            )
-
-    feedbacks = []
-    appointments = get_appointments(db, current_patient)
-    for app in appointments:
-        feedback = db.query(models.FeedBack).filter(models.FeedBack.appointment_id == app.id).first()
-        if feedback:
-            feedbacks.append(feedback)
-
-    if not feedbacks:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail="No Existing Reschedules For You !")
-
-    return feedbacks
\ No newline at end of file
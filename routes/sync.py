@@ -0,0 +1,98 @@
+# CHANGES SINCE THE LAST SYNC
+# mobile clients keep a local copy of their appointments, reschedules and feedbacks. the
+# first GET /sync sends everything, the following ones send back the previous token as
+# ?since= and only get the rows changed since then plus the ids of the deleted ones.
+# a client applies the deletions, then upserts the rows.
+# the changes are sent in pages of appointments, the deletions with the first page and the
+# token with the last one: a client keeps its previous token until it has every page
+import datetime
+from collections import defaultdict
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from database import get_db
+from oauth2 import get_current_principal, Principal
+from schemas import SyncOut
+from pagination import sync_since, next_sync_token, encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from routes.doctor import APPOINTMENT_ROW, FEEDBACK_ROW
+from routes.patient import RESCHEDULE_ROW
+import models
+
+router = APIRouter(tags=["Sync"])
+
+
+def read_cursor(cursor: str):
+    # the database time the sync started at, on its first page, and the last appointment sent
+    started, last_id = decode_cursor(cursor, 2)
+    try:
+        started = datetime.datetime.fromisoformat(started)
+    except (TypeError, ValueError):
+        started = None
+    if started is None or started.tzinfo is None or not isinstance(last_id, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid pagination cursor.")
+    return started, last_id
+
+
+@router.get("/sync", response_model=SyncOut)
+def get_changes(response: Response, since: Optional[str] = None, cursor: Optional[str] = None,
+                limit: int = Query(200, ge=1, le=1000), db: Session=Depends(get_db),
+                current_user: Principal=Depends(get_current_principal)):
+
+    Appointment = models.Appointment
+    Tombstone = models.Tombstone
+    if current_user.role == "doctor": #type: ignore
+        owner, tombstone_owner = Appointment.doctor_id, Tombstone.doctor_id
+    else:
+        owner, tombstone_owner = Appointment.patient_id, Tombstone.patient_id
+
+    # database clock, the one updated_at and deleted_at are written with. on the primary, as
+    # for the calendar feed: a lagging replica would issue tokens past writes it hasn't replayed.
+    # the following pages keep the time of the first one, the token has to cover the changes
+    # made to the pages already sent while the client was fetching the next ones
+    if cursor:
+        now, last_id = read_cursor(cursor)
+    else:
+        now, last_id = db.execute(select(func.now())).scalar(), None
+    since_time = sync_since(since, now)
+
+    # a reschedule or feedback change touches its appointment, so the changed appointments
+    # are found on (owner, updated_at) and their changed children through the primary keys
+    mine = [owner == current_user.id]
+    if since_time is not None:
+        mine.append(Appointment.updated_at > since_time)
+    if last_id is not None:
+        mine.append(Appointment.id > last_id)
+
+    appointments = db.execute(select(APPOINTMENT_ROW).where(*mine).order_by(Appointment.id).limit(
+        limit + 1)).scalars().all()
+    next_cursor = None
+    if len(appointments) > limit:
+        appointments = appointments[:limit]
+        next_cursor = encode_cursor(now, appointments[-1].id)
+    page = [appointment.id for appointment in appointments]
+
+    reschedules = select(RESCHEDULE_ROW).where(models.RescheduleRequest.appointment_id.in_(page))
+    feedbacks = select(FEEDBACK_ROW).where(models.FeedBack.appointment_id.in_(page))
+    if since_time is not None:
+        reschedules = reschedules.where(models.RescheduleRequest.updated_at > since_time)
+        feedbacks = feedbacks.where(models.FeedBack.updated_at > since_time)
+
+    rows = {
+        "appointments": appointments,
+        "reschedules": db.execute(reschedules.order_by(models.RescheduleRequest.appointment_id)).scalars().all(),
+        "feedbacks": db.execute(feedbacks.order_by(models.FeedBack.appointment_id)).scalars().all(),
+    }
+
+    # sent before any row: a feedback removed then written again is deleted, then upserted
+    deleted = defaultdict(set)
+    if since_time is not None and last_id is None:
+        for entity, entity_id in db.execute(select(Tombstone.entity, Tombstone.entity_id).where(
+                tombstone_owner == current_user.id, Tombstone.deleted_at > since_time)):
+            deleted[entity + "s"].add(entity_id)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return {"full": since_time is None, "token": None if next_cursor else next_sync_token(now), **rows,
+            "deleted": {name: sorted(deleted[name]) for name in rows}}
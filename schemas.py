@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, TypeAdapter
 import datetime
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 
 
 class UserLogin(BaseModel):
@@ -25,6 +25,8 @@ class DoctorCreate(DoctorBase):
 
 class DoctorOut(DoctorBase):
     id: int
+    rating_count: int = 0
+    rating_average: Optional[float] = None
 
 class DoctorUpdate(BaseModel):
     first_name : Optional[str] = None
@@ -85,18 +87,79 @@ class ConfirmAppointment(BaseModel):
     confirmed: bool
     done: bool
 
+class AvailableSlot(BaseModel):
+    doctor_id: int
+    first_name: str
+    last_name: str
+    specialty: str
+    city: str
+    date: datetime.date
+    time: datetime.time
+    class Config:
+        from_attributes = True
+
 # ------------------ Reschedules ------------------
 
 class Reschedule(BaseModel):
     new_date: datetime.date
     new_time: datetime.time
 
+class RescheduleOut(Reschedule):
+    appointment_id: int
+    old_date: datetime.date
+    old_time: datetime.time
+    class Config:
+        from_attributes = True
+
 # ------------------ FeedBack ------------------
 
 class FeedBack(BaseModel):
     rating: Literal[0, 1, 2, 3, 4]
     plain: Optional[str] = None
 
+# feedbacks.rating is nullable, only new feedbacks are required to carry one
+class FeedBackOut(FeedBack):
+    rating: Optional[Literal[0, 1, 2, 3, 4]] = None
+    appointment_id: int
+    class Config:
+        from_attributes = True
+
+# ------------------ Dashboard ------------------
+
+class DayAppointments(BaseModel):
+    date: datetime.date
+    appointments: int
+
+class DoctorDashboard(BaseModel):
+    upcoming: List[DayAppointments]
+    unconfirmed: int
+    pending_reschedules: int
+    patients: int
+    feedbacks: int
+    rating_average: Optional[float]
+
+# ------------------ Calendar ------------------
+
+class CalendarFeedOut(BaseModel):
+    url: str
+
+# ------------------ Sync ------------------
+
+# ids of the rows deleted since the token, reschedules and feedbacks by appointment id
+class SyncDeleted(BaseModel):
+    appointments: List[int]
+    reschedules: List[int]
+    feedbacks: List[int]
+
+# token is only set on the last page, the next cursor is in the X-Next-Cursor header
+class SyncOut(BaseModel):
+    full: bool
+    token: Optional[str]
+    appointments: List[AppointmentOut]
+    reschedules: List[RescheduleOut]
+    feedbacks: List[FeedBackOut]
+    deleted: SyncDeleted
+
 # ------------------ JWT Tokens ------------------
 
 class Token(BaseModel):
@@ -107,4 +170,16 @@ class Token(BaseModel):
 # what payload data does the token embeds
 class TokenData(BaseModel):
     id : Optional[int]
-    role: Optional[str]
\ No newline at end of file
+    role: Optional[str]
+
+
+# ------------------ Precompiled serializers ------------------
+# built once at import, see serialization.py and etags.py
+
+DOCTOR_OUT = TypeAdapter(DoctorOut)
+DOCTOR_OUT_LIST = TypeAdapter(List[DoctorOut])
+PATIENT_OUT_LIST = TypeAdapter(List[PatientOut])
+APPOINTMENT_OUT_LIST = TypeAdapter(List[AppointmentOut])
+AVAILABLE_SLOT_LIST = TypeAdapter(List[AvailableSlot])
+RESCHEDULE_OUT_LIST = TypeAdapter(List[RescheduleOut])
+FEEDBACK_OUT_LIST = TypeAdapter(List[FeedBackOut])
\ No newline at end of file
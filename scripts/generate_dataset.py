@@ -0,0 +1,249 @@
+# DETERMINISTIC SYNTHETIC DATASET AT PRODUCTION SCALE
+#
+#   python -m scripts.generate_dataset                  50k doctors, 2M patients, 50M appointments
+#   python -m scripts.generate_dataset --scale 0.01     same shape, a hundredth of the rows
+#   python -m scripts.generate_dataset --truncate       replace the current data
+#
+# the same --seed, --scale and --anchor always produce the same rows and ids, so benchmarks
+# and query plan checks run against identical data. everything is loaded with COPY, the
+# password is hashed once and shared by every user (log in as doctor<n>@felwaqt.test or
+# patient<n>@felwaqt.test).
+#
+# appointments respect both slot constraints by construction: doctor d's k-th appointment
+# sits on a distinct slot of the configured grid, and the patient of slot s is
+# (d + s * step) mod patients, a different patient for every doctor of the same slot.
+import argparse
+import csv
+import datetime
+import io
+import math
+import random
+import sys
+import time
+from config import settings
+from database import engine
+from scripts.rebuild_doctor_stats import rebuild as rebuild_doctor_stats
+import utils
+
+DOCTORS = 50_000
+PATIENTS = 2_000_000
+APPOINTMENTS = 50_000_000
+
+RESCHEDULED = 0.05  # of the upcoming appointments
+FEEDBACK = 0.30     # of the past appointments
+CONFIRMED = 0.70    # of the upcoming appointments
+
+COPY_CHUNK = 100_000
+
+FIRST_NAMES = ["Amine", "Yacine", "Karim", "Sofiane", "Mehdi", "Walid", "Nassim", "Riad", "Hichem", "Farid",
+               "Amel", "Yasmine", "Sarah", "Lina", "Imane", "Nour", "Meriem", "Kenza", "Samia", "Lynda"]
+LAST_NAMES = ["Benali", "Bouzid", "Haddad", "Mansouri", "Belkacem", "Cherif", "Khelifi", "Saadi", "Boudiaf",
+              "Ziani", "Rahmani", "Hamidi", "Meziane", "Benamar", "Toumi", "Brahimi", "Kaci", "Amrani"]
+SPECIALTIES = ["Generaliste", "Cardiologue", "Dermatologue", "Pediatre", "Gynecologue", "Ophtalmologue",
+               "Dentiste", "Orl", "Neurologue", "Psychiatre", "Rhumatologue", "Pneumologue"]
+CITIES = [("Alger", "16000"), ("Oran", "31000"), ("Constantine", "25000"), ("Annaba", "23000"),
+          ("Blida", "09000"), ("Setif", "19000"), ("Batna", "05000"), ("Tlemcen", "13000"),
+          ("Bejaia", "06000"), ("Tizi ouzou", "15000"), ("Biskra", "07000"), ("Ouargla", "30000")]
+STREETS = ["Rue Didouche Mourad", "Boulevard Zighout Youcef", "Rue Larbi Ben Mhidi", "Avenue de l'ALN",
+           "Rue Hassiba Ben Bouali", "Boulevard Mohamed V", "Rue Abane Ramdane", "Cite 1000 logements"]
+CASES = ["Consultation", "Checkup", "Follow-up", "Vaccination", "Prescription", "Test results", "Emergency"]
+COMMENTS = ["Very attentive.", "Long wait but good care.", "Clear explanations.", "Would recommend.",
+            "Rushed consultation.", "Friendly staff.", "Did not listen.", "Excellent doctor."]
+
+
+def slot_grid(first_day: datetime.date, days: int):
+    # every (date, time) of the configured grid over the span, in chronological order
+    step = datetime.timedelta(minutes=settings.slot_minutes)
+    grid = []
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        if day.weekday() in settings.slot_days_off:
+            continue
+        slot = datetime.datetime.combine(day, settings.slot_day_start)
+        day_end = datetime.datetime.combine(day, settings.slot_day_end)
+        while slot < day_end:
+            grid.append((day, slot.time()))
+            slot += step
+    return grid
+
+
+def coprime_step(patients: int):
+    # spreads each patient's appointments over many doctors instead of repeating one
+    step = max(int(patients * 0.618), 1)
+    while math.gcd(step, patients) != 1:
+        step += 1
+    return step
+
+
+def copy_rows(cursor, table: str, columns, rows):
+    # streams rows into table in COPY_CHUNK sized batches
+    column_list = ", ".join(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % COPY_CHUNK == 0:
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            buffer.seek(0)
+            buffer.truncate()
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return count
+
+
+def doctor_rows(rng: random.Random, doctors: int, password: str):
+    for n in range(1, doctors + 1):
+        city, postal_code = rng.choice(CITIES)
+        yield (n, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"doctor{n}@felwaqt.test", f"+2135{n:08d}",
+               rng.choice(SPECIALTIES), city, rng.choice(STREETS), postal_code,
+               f"https://cdn.felwaqt.test/doctors/{n}.jpg", "doctor", password)
+
+
+def patient_rows(rng: random.Random, patients: int, password: str):
+    for n in range(1, patients + 1):
+        yield (n, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"patient{n}@felwaqt.test", f"+2136{n:08d}",
+               "patient", password)
+
+
+def appointment_rows(rng: random.Random, doctors: int, patients: int, appointments: int, grid, anchor, children):
+    # children collects the reschedule and feedback rows of the generated appointments
+    per_doctor, extra = divmod(appointments, doctors)
+    step = coprime_step(patients)
+    appointment_id = 0
+
+    for d in range(doctors):
+        count = per_doctor + (1 if d < extra else 0)
+        for k in range(count):
+            # distinct slots for one doctor, shifted per doctor so slots don't all fill up together
+            s = (k * len(grid) // count + d) % len(grid)
+            day, slot_time = grid[s]
+            patient = (d + s * step) % patients
+            appointment_id += 1
+
+            past = day < anchor
+            confirmed = past or rng.random() < CONFIRMED
+            yield (appointment_id, patient + 1, d + 1, day, slot_time, rng.choice(CASES), past, confirmed)
+
+            if past and rng.random() < FEEDBACK:
+                children["feedbacks"].append((appointment_id, rng.randint(0, 4), rng.choice(COMMENTS)))
+            elif not past and rng.random() < RESCHEDULED:
+                new_date = day + datetime.timedelta(days=rng.choice((1, 2, 7, 14)))
+                children["reschedules"].append((appointment_id, day, slot_time, new_date, slot_time))
+
+        # children are flushed by the caller once they pile up
+        if len(children["feedbacks"]) + len(children["reschedules"]) >= COPY_CHUNK:
+            yield None
+
+
+def load_appointments(cursor, rng, doctors, patients, appointments, grid, anchor):
+    children = {"feedbacks": [], "reschedules": []}
+    totals = {"appointments": 0, "feedbacks": 0, "reschedules": 0}
+    columns = {
+        "appointments": ("id", "patient_id", "doctor_id", "date", "time", "\"case\"", "done", "confirmed"),
+        "feedbacks": ("appointment_id", "rating", "plain"),
+        "reschedules": ("appointment_id", "old_date", "old_time", "new_date", "new_time"),
+    }
+
+    def flush_children():
+        for table in ("feedbacks", "reschedules"):
+            totals[table] += copy_rows(cursor, table, columns[table], children[table])
+            children[table].clear()
+
+    batch = []
+    start = time.perf_counter()
+    for row in appointment_rows(rng, doctors, patients, appointments, grid, anchor, children):
+        if row is not None:
+            batch.append(row)
+        if row is None or len(batch) >= COPY_CHUNK:
+            # parents before children, the foreign keys are checked row by row
+            totals["appointments"] += copy_rows(cursor, "appointments", columns["appointments"], batch)
+            batch.clear()
+            flush_children()
+            elapsed = time.perf_counter() - start
+            print(f"{totals['appointments']} appointments, {totals['appointments'] / elapsed:.0f} rows/s", file=sys.stderr)
+
+    totals["appointments"] += copy_rows(cursor, "appointments", columns["appointments"], batch)
+    flush_children()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset.")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=datetime.date.fromisoformat, default=datetime.date(2026, 1, 1),
+                        help="appointments before this date are done, the others upcoming")
+    parser.add_argument("--days", type=int, default=730, help="span of the appointments, centered on the anchor")
+    parser.add_argument("--password", default="felwaqt-dataset")
+    parser.add_argument("--truncate", action="store_true", help="delete the current users and appointments first")
+    args = parser.parse_args()
+
+    doctors = max(int(DOCTORS * args.scale), 1)
+    patients = max(int(PATIENTS * args.scale), doctors)
+    appointments = int(APPOINTMENTS * args.scale)
+    grid = slot_grid(args.anchor - datetime.timedelta(days=args.days // 2), args.days)
+    if appointments > doctors * len(grid):
+        sys.exit(f"{args.days} days hold at most {doctors * len(grid)} appointments, raise --days.")
+
+    rng = random.Random(args.seed)
+    password = utils.pwd_context.hash(args.password)
+    conn = engine.raw_connection()
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM doctors) OR EXISTS (SELECT 1 FROM patients)")
+        if cursor.fetchone()[0]:
+            if not args.truncate:
+                sys.exit("The database already holds users, pass --truncate to replace them.")
+            cursor.execute("TRUNCATE doctors, patients, accounts RESTART IDENTITY CASCADE")
+
+        # accounts are filled with one statement instead of a trigger call per row
+        cursor.execute("ALTER TABLE doctors DISABLE TRIGGER doctors_sync_account")
+        cursor.execute("ALTER TABLE patients DISABLE TRIGGER patients_sync_account")
+        copy_rows(cursor, "doctors", ("id", "first_name", "last_name", "email", "phone", "specialty", "city",
+                                      "street", "postal_code", "personal_picture", "role", "password"),
+                  doctor_rows(rng, doctors, password))
+        copy_rows(cursor, "patients", ("id", "first_name", "last_name", "email", "phone", "role", "password"),
+                  patient_rows(rng, patients, password))
+        cursor.execute("""
+            INSERT INTO accounts (email, role, user_id, password)
+            SELECT email, 'doctor', id, password FROM doctors
+            UNION ALL
+            SELECT email, 'patient', id, password FROM patients
+        """)
+        cursor.execute("ALTER TABLE doctors ENABLE TRIGGER doctors_sync_account")
+        cursor.execute("ALTER TABLE patients ENABLE TRIGGER patients_sync_account")
+        conn.commit()
+        print(f"{doctors} doctors and {patients} patients loaded", file=sys.stderr)
+
+        # rating aggregates are computed once at the end instead of a trigger call per feedback,
+        # and the appointments already carry the load time as updated_at, like their children
+        cursor.execute("ALTER TABLE feedbacks DISABLE TRIGGER feedbacks_sync_doctor_stats")
+        cursor.execute("ALTER TABLE feedbacks DISABLE TRIGGER feedbacks_touch_appointment")
+        cursor.execute("ALTER TABLE reschedules DISABLE TRIGGER reschedules_touch_appointment")
+        totals = load_appointments(cursor, rng, doctors, patients, appointments, grid, args.anchor)
+        cursor.execute("ALTER TABLE reschedules ENABLE TRIGGER reschedules_touch_appointment")
+        cursor.execute("ALTER TABLE feedbacks ENABLE TRIGGER feedbacks_touch_appointment")
+        cursor.execute("ALTER TABLE feedbacks ENABLE TRIGGER feedbacks_sync_doctor_stats")
+        rebuild_doctor_stats(cursor)
+        conn.commit()
+
+        # ids were given explicitly, move the sequences past them
+        for table in ("doctors", "patients", "appointments"):
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM {table}), false)")
+        conn.commit()
+
+    # fresh statistics, otherwise the planner still sees empty tables
+    conn.set_isolation_level(0)
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    conn.close()
+
+    print(f"Done: {doctors} doctors, {patients} patients, {totals['appointments']} appointments, "
+          f"{totals['reschedules']} reschedules, {totals['feedbacks']} feedbacks.")
+
+
+if __name__ == "__main__":
+    main()
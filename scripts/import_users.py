@@ -0,0 +1,202 @@
+# BULK IMPORT OF DOCTORS OR PATIENTS FROM CSV / JSONL
+#
+#   python -m scripts.import_users doctors doctors.csv
+#   python -m scripts.import_users patients patients.jsonl --rejects rejects.jsonl
+#
+# rows are validated with the same schemas as the routes and normalised the same way,
+# passwords are hashed on every core and each batch is loaded with COPY into a staging
+# table then inserted with one statement. invalid and duplicate rows are reported, not fatal.
+#
+# passwords are hashed with bcrypt at --hash-rounds (4 by default, thousands of hashes per
+# second per core instead of a few at the app's cost). the first login of each user rehashes
+# at the configured cost (utils.verify_and_update), use --prehashed when the input already
+# holds password hashes.
+import argparse
+import csv
+import functools
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from passlib.hash import bcrypt
+from pydantic import ValidationError
+from database import engine
+from schemas import DoctorCreate, PatientCreate
+import models
+import utils
+
+TARGETS = {
+    "doctors": (DoctorCreate, ("first_name", "last_name", "specialty", "city")),
+    "patients": (PatientCreate, ("first_name", "last_name")),
+}
+
+MODELS = {"doctors": models.Doctor, "patients": models.Patient}
+
+
+def column_lengths(table: str) -> dict:
+    # limits of the varchar(n) columns, one value too long would fail the insert of its whole batch
+    return {column.name: column.type.length for column in MODELS[table].__table__.columns
+            if getattr(column.type, "length", None)}
+
+
+def read_records(path: str, file_format: str):
+    # yields (line number, dict) without loading the whole file
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            for line, record in enumerate(csv.DictReader(source), start=2):
+                yield line, {key: value for key, value in record.items() if value != ""}
+        else:
+            for line, raw in enumerate(source, start=1):
+                if raw.strip():
+                    try:
+                        yield line, json.loads(raw)
+                    except json.JSONDecodeError as exc:
+                        yield line, exc
+
+
+def batches(records, size: int):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prepare(batch, schema, capitalized_fields, lengths: dict, prehashed: bool, rejects):
+    # validated and normalised rows, as create_doctor / create_patient would store them
+    rows = []
+    for line, record in batch:
+        if isinstance(record, Exception):
+            rejects.append({"line": line, "reason": f"Invalid JSON: {record}"})
+            continue
+        try:
+            user = schema(**record)
+        except ValidationError as exc:
+            rejects.append({"line": line, "reason": exc.errors(include_url=False, include_context=False)})
+            continue
+
+        if prehashed and not utils.pwd_context.identify(user.password):
+            rejects.append({"line": line, "reason": "Password is not a supported hash."})
+            continue
+
+        user_dict = user.model_dump()
+        for field in capitalized_fields:
+            user_dict[field] = user_dict[field].capitalize()
+
+        too_long = [field for field, length in lengths.items()
+                    if isinstance(user_dict.get(field), str) and len(user_dict[field]) > length]
+        if too_long:
+            rejects.append({"line": line, "reason": "Too long: " + ", ".join(
+                f"{field} (at most {lengths[field]} characters)" for field in too_long)})
+            continue
+        rows.append((line, user_dict))
+    return rows
+
+
+def hash_password(rounds: int, password: str):
+    # runs in the worker processes
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def load(conn, table: str, columns, rows):
+    # returns {line: reason} of the rows that were not inserted, the others were
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line, user_dict in rows:
+        writer.writerow([line] + [user_dict[column] for column in columns])
+    buffer.seek(0)
+
+    column_list = ", ".join(columns)
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS import_staging (line integer, {', '.join(f'{c} text' for c in columns)}) ON COMMIT DELETE ROWS")
+        cursor.copy_expert(f"COPY import_staging (line, {column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+        # emails are unique across patients and doctors (accounts table)
+        rejected = {}
+        cursor.execute("DELETE FROM import_staging WHERE email IN (SELECT email FROM accounts) RETURNING line")
+        rejected.update((line, "Email already used.") for (line,) in cursor.fetchall())
+
+        # one line per email and round, the other unique columns (phone, picture) are left to
+        # ON CONFLICT: when the line of an email conflicts, its next line gets the next round
+        imported_from = {}
+        while True:
+            cursor.execute("SELECT DISTINCT ON (email) line, email FROM import_staging ORDER BY email, line")
+            picked = dict(cursor.fetchall())
+            if not picked:
+                break
+
+            cursor.execute(f"""
+                INSERT INTO {table} ({column_list})
+                SELECT {column_list} FROM import_staging WHERE line = ANY(%s)
+                ON CONFLICT DO NOTHING
+                RETURNING email
+            """, (list(picked),))
+            inserted = {email for (email,) in cursor.fetchall()}
+            imported_from.update((email, line) for line, email in picked.items() if email in inserted)
+
+            cursor.execute("DELETE FROM import_staging WHERE line = ANY(%s) OR email = ANY(%s) RETURNING line, email",
+                           (list(picked), list(inserted)))
+            for line, email in cursor.fetchall():
+                if line not in picked:
+                    rejected[line] = f"Email already imported from line {imported_from[email]}."
+                elif email not in inserted:
+                    rejected[line] = "Phone or picture already used."
+    conn.commit()
+    return rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import doctors or patients.")
+    parser.add_argument("table", choices=TARGETS)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--prehashed", action="store_true", help="the password column already holds hashes")
+    parser.add_argument("--hash-rounds", type=int, default=4,
+                        help="bcrypt cost of the imported passwords, raised to the configured cost on first login")
+    parser.add_argument("--rejects", default="rejects.jsonl", help="where rejected rows are reported")
+    args = parser.parse_args()
+
+    file_format = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    schema, capitalized_fields = TARGETS[args.table]
+    columns = list(schema.model_fields)
+    lengths = column_lengths(args.table)
+
+    imported = rejected = 0
+    start = time.perf_counter()
+    conn = engine.raw_connection()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, open(args.rejects, "w") as rejects_file:
+        for batch in batches(read_records(args.path, file_format), args.batch_size):
+            rejects = []
+            rows = prepare(batch, schema, capitalized_fields, lengths, args.prehashed, rejects)
+
+            if not args.prehashed:
+                passwords = [user_dict["password"] for _, user_dict in rows]
+                hashed_passwords = executor.map(functools.partial(hash_password, args.hash_rounds), passwords, chunksize=32)
+                for (_, user_dict), hashed in zip(rows, hashed_passwords):
+                    user_dict["password"] = hashed
+
+            not_inserted = load(conn, args.table, columns, rows) if rows else {}
+            rejects.extend({"line": line, "reason": reason} for line, reason in sorted(not_inserted.items()))
+
+            for reject in rejects:
+                rejects_file.write(json.dumps(reject, default=str) + "\n")
+            imported += len(rows) - len(not_inserted)
+            rejected += len(rejects)
+
+            elapsed = time.perf_counter() - start
+            print(f"{imported} imported, {rejected} rejected, {(imported + rejected) / elapsed:.0f} rows/s", file=sys.stderr)
+
+    conn.close()
+    print(f"Done: {imported} {args.table} imported, {rejected} rejected (see {args.rejects}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# DELETE THE TOMBSTONES OLDER THAN TOMBSTONE_RETENTION_DAYS
+#
+#   python -m scripts.purge_tombstones
+#
+# meant to run daily. sync tokens older than the retention already get a full sync
+# instead of a delta, so nothing still relies on the purged rows.
+from sqlalchemy import text
+from config import settings
+from database import engine
+
+BATCH_SIZE = 10_000
+
+
+def main():
+    purged = 0
+    with engine.connect() as conn:
+        # in batches, so no single transaction holds locks on a large part of the table
+        while True:
+            deleted = conn.execute(text("""
+                DELETE FROM tombstones WHERE id IN (
+                    SELECT id FROM tombstones WHERE deleted_at < now() - make_interval(days => :days) LIMIT :batch
+                )
+            """), {"days": settings.tombstone_retention_days, "batch": BATCH_SIZE}).rowcount
+            conn.commit()
+            purged += deleted
+            if deleted < BATCH_SIZE:
+                break
+
+    print(f"{purged} tombstones purged.")
+
+
+if __name__ == "__main__":
+    main()
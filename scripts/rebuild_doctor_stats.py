@@ -0,0 +1,75 @@
+# REBUILD THE RATING AGGREGATES OF doctor_stats FROM THE FEEDBACKS
+#
+#   python -m scripts.rebuild_doctor_stats           repair the rows that drifted
+#   python -m scripts.rebuild_doctor_stats --check   only report them, exit 1 if any
+#
+# the triggers keep doctor_stats exact, this is for bulk loads run with the triggers
+# disabled (scripts/generate_dataset.py) or after editing feedbacks by hand.
+# writes to appointments and feedbacks wait while the aggregates are recomputed.
+import argparse
+import sys
+from database import engine
+
+# doctors missing a row (inserted with the triggers disabled) get one first
+CREATE_MISSING = """
+    INSERT INTO doctor_stats (doctor_id)
+    SELECT id FROM doctors
+    WHERE NOT EXISTS (SELECT 1 FROM doctor_stats WHERE doctor_stats.doctor_id = doctors.id)
+    RETURNING doctor_id
+"""
+
+REPAIR = """
+    UPDATE doctor_stats
+    SET rating_count = totals.rating_count, rating_sum = totals.rating_sum, rating_histogram = totals.rating_histogram
+    FROM (
+        SELECT doctors.id AS doctor_id, count(feedbacks.rating) AS rating_count,
+               coalesce(sum(feedbacks.rating), 0) AS rating_sum,
+               ARRAY[count(*) FILTER (WHERE feedbacks.rating = 0), count(*) FILTER (WHERE feedbacks.rating = 1),
+                     count(*) FILTER (WHERE feedbacks.rating = 2), count(*) FILTER (WHERE feedbacks.rating = 3),
+                     count(*) FILTER (WHERE feedbacks.rating = 4)]::integer[] AS rating_histogram
+        FROM doctors
+        LEFT JOIN appointments ON appointments.doctor_id = doctors.id
+        LEFT JOIN feedbacks ON feedbacks.appointment_id = appointments.id
+        GROUP BY doctors.id
+    ) totals
+    WHERE doctor_stats.doctor_id = totals.doctor_id
+    AND (doctor_stats.rating_count, doctor_stats.rating_sum, doctor_stats.rating_histogram)
+        IS DISTINCT FROM (totals.rating_count, totals.rating_sum, totals.rating_histogram)
+    RETURNING doctor_stats.doctor_id
+"""
+
+
+def rebuild(cursor):
+    # returns the number of doctors whose aggregates were missing or wrong, the caller commits
+    cursor.execute("LOCK TABLE appointments, feedbacks IN SHARE MODE")
+    cursor.execute(CREATE_MISSING)
+    drifted = {doctor_id for (doctor_id,) in cursor.fetchall()}
+    cursor.execute(REPAIR)
+    drifted.update(doctor_id for (doctor_id,) in cursor.fetchall())
+    return len(drifted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the doctor rating aggregates.")
+    parser.add_argument("--check", action="store_true", help="report drifted doctors without repairing them")
+    args = parser.parse_args()
+
+    conn = engine.raw_connection()
+    with conn.cursor() as cursor:
+        drifted = rebuild(cursor)
+    if args.check:
+        conn.rollback()
+    else:
+        conn.commit()
+    conn.close()
+
+    if args.check:
+        print(f"{drifted} doctors have drifted aggregates.")
+        if drifted:
+            sys.exit(1)
+    else:
+        print(f"{drifted} doctors repaired.")
+
+
+if __name__ == "__main__":
+    main()
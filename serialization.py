@@ -0,0 +1,21 @@
+# FAST JSON PATH FOR LIST RESPONSES, ENABLED WITH FAST_JSON
+# by default FastAPI validates what a handler returns against its response_model, dumps it
+# to python objects, then json.dumps them. with fast_json the list endpoints validate their
+# ORM rows once with the precompiled adapters of schemas.py and pydantic-core writes the
+# json bytes straight away, every other response is encoded with orjson (see main.py)
+from typing import Optional
+from fastapi import Response
+from config import settings
+
+
+def list_response(adapter, rows, response: Optional[Response] = None):
+    # headers set on the injected response (next cursor) are only applied by FastAPI
+    # to returned objects, a returned Response has to carry them itself
+    if not settings.fast_json:
+        return rows
+
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    headers = {}
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(content=body, media_type="application/json", headers=headers)
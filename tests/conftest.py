@@ -0,0 +1,18 @@
+# settings are read from the environment when config is imported, these values let the app
+# import without a .env. engines connect lazily, nothing here talks to postgres
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for name, value in {
+    "DATABASE_HOSTNAME": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_PASSWORD": "felwaqt",
+    "DATABASE_NAME": "felwaqt_test",
+    "DATABASE_USERNAME": "felwaqt",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+}.items():
+    os.environ.setdefault(name, value)
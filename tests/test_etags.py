@@ -0,0 +1,54 @@
+import pytest
+from fastapi.testclient import TestClient
+from cache import doctor_cache
+from etags import render_json
+from schemas import DoctorOut, DOCTOR_OUT
+import main
+
+DOCTOR = DoctorOut(id=1, first_name="Amel", last_name="Haddad", email="amel.haddad@felwaqt.dz", phone="+213500000001",
+                   specialty="Cardiologue", city="Oran", street="Rue Larbi Ben Mhidi", postal_code="31000",
+                   personal_picture="https://cdn.felwaqt.test/doctors/1.jpg", rating_count=3, rating_average=3.5)
+
+
+@pytest.fixture
+def client():
+    # a cached profile, served without touching the database
+    rendered = render_json(DOCTOR_OUT, DOCTOR)
+    doctor_cache.set(DOCTOR.id, rendered)
+    yield TestClient(main.app), rendered
+    doctor_cache.invalidate(DOCTOR.id)
+
+
+def test_profile_carries_a_strong_etag(client):
+    client, rendered = client
+    response = client.get("/doctors/1")
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == rendered.etag
+    assert not rendered.etag.startswith("W/")
+    assert "max-age" in response.headers["cache-control"]
+    assert DoctorOut.model_validate_json(response.content) == DOCTOR
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_etag_answers_304(client, if_none_match):
+    client, rendered = client
+    response = client.get("/doctors/1", headers={"If-None-Match": if_none_match.format(etag=rendered.etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == rendered.etag
+
+
+def test_stale_etag_gets_the_body(client):
+    client, rendered = client
+    response = client.get("/doctors/1", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == rendered.body
+
+
+def test_etag_follows_the_content():
+    changed = DOCTOR.model_copy(update={"rating_count": 4})
+    assert render_json(DOCTOR_OUT, DOCTOR).etag == render_json(DOCTOR_OUT, DOCTOR).etag
+    assert render_json(DOCTOR_OUT, DOCTOR).etag != render_json(DOCTOR_OUT, changed).etag
@@ -0,0 +1,28 @@
+import datetime
+import ical
+
+UTC = datetime.timezone.utc
+
+
+def test_cancelled_event_matches_the_live_event():
+    # a tombstone's starts_at is the timestamptz of the appointment's date + timetz, the
+    # cancelled event must carry the same DTSTART as the event it cancels
+    algiers = datetime.timezone(datetime.timedelta(hours=1))
+    start = datetime.datetime.combine(datetime.date(2026, 3, 1), datetime.time(9, 30, tzinfo=algiers))
+    end = start + datetime.timedelta(minutes=30)
+    modified = datetime.datetime(2026, 2, 1, tzinfo=UTC)
+
+    live = ical.event("appointment-1@felwaqt", start, end, "Amel Haddad - Checkup", True, modified)
+    cancelled = ical.cancelled_event("appointment-1@felwaqt", start.astimezone(UTC), end.astimezone(UTC), modified)
+
+    assert "DTSTART:20260301T083000Z\r\n" in live
+    assert "DTSTART:20260301T083000Z\r\n" in cancelled
+    assert "STATUS:CANCELLED\r\n" in cancelled
+
+
+def test_long_lines_are_folded_on_character_boundaries():
+    line = "SUMMARY:" + "é" * 60
+    folded = ical.fold(line)
+
+    assert all(len(part.encode()) <= 75 for part in folded.split("\r\n"))
+    assert folded.replace("\r\n ", "") == line + "\r\n"
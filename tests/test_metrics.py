@@ -0,0 +1,66 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+import metrics
+
+
+def test_statements_are_only_counted_inside_a_request():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert metrics.request_statements.get() is None
+
+        statements = [0]
+        token = metrics.request_statements.set(statements)
+        try:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 1"))
+        finally:
+            metrics.request_statements.reset(token)
+        conn.execute(text("SELECT 1"))
+
+    assert statements == [2]
+    engine.dispose()
+
+
+def test_statements_of_a_streamed_body_are_counted():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(metrics.RequestMetrics)
+
+    @app.get("/metrics-test/stream")
+    def stream():
+        def lines():
+            # runs after the handler returned, while the body is sent
+            with engine.connect() as conn:
+                for _ in range(3):
+                    yield f"{conn.execute(text('SELECT 1')).scalar()}\n"
+        return StreamingResponse(lines())
+
+    labels = {"method": "GET", "route": "/metrics-test/stream"}
+    before = REGISTRY.get_sample_value("felwaqt_request_sql_statements_sum", labels) or 0
+
+    assert TestClient(app).get("/metrics-test/stream").text == "1\n1\n1\n"
+    assert REGISTRY.get_sample_value("felwaqt_request_sql_statements_sum", labels) - before == 3
+    assert REGISTRY.get_sample_value("felwaqt_request_duration_seconds_count",
+                                     {**labels, "status": "200"}) >= 1
+    engine.dispose()
+
+
+def test_every_pool_is_collected():
+    engines = {"sync": create_engine("sqlite://", poolclass=metrics.InstrumentedQueuePool),
+               "replica-0": create_engine("sqlite://", poolclass=metrics.InstrumentedQueuePool, pool_size=3)}
+    with engines["replica-0"].connect():
+        families = {family.name: family for family in metrics.PoolCollector(engines).collect()}
+
+    size = {sample.labels["pool"]: sample.value for sample in families["felwaqt_pool_size"].samples}
+    checked_out = {sample.labels["pool"]: sample.value for sample in families["felwaqt_pool_checked_out"].samples}
+    assert size == {"sync": 5, "replica-0": 3}
+    assert checked_out == {"sync": 0, "replica-0": 1}
+    for engine in engines.values():
+        engine.dispose()
@@ -0,0 +1,91 @@
+import base64
+import datetime
+import struct
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from pagination import encode_cursor, decode_cursor, after_cursor, sync_since
+from routes.home import search_statement
+from routes import sync
+from sqlalchemy import select
+import models
+
+
+def compile_statement(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+
+def test_cursor_round_trip_is_exact():
+    # a rank that went through a postgres real, the cursor must give back the same double
+    rank = struct.unpack("f", struct.pack("f", 0.7))[0]
+    day, time = datetime.date(2026, 3, 1), datetime.time(9, 30)
+
+    assert decode_cursor(encode_cursor(rank, 42), 2) == [rank, 42]
+    assert decode_cursor(encode_cursor(day, time, 7), 3) == [day.isoformat(), time.isoformat(), 7]
+
+
+@pytest.mark.parametrize("cursor", ["not base64 !", encode_cursor(1, 2), base64.urlsafe_b64encode(b'{"id": 1}').decode()])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 1)
+    assert error.value.status_code == 400
+
+
+def test_after_cursor_parses_dates_and_times():
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+    cursor = encode_cursor(datetime.date(2026, 3, 1), datetime.time(9, 30), 7)
+    params = compile_statement(after_cursor(select(models.Appointment.id), order, cursor)).params
+
+    assert sorted(params.values(), key=str) == sorted([datetime.date(2026, 3, 1), datetime.time(9, 30), 7], key=str)
+
+
+def test_search_rank_is_a_double_everywhere():
+    # a real rank compared to the double of the cursor never equals the row it came from
+    sql = str(compile_statement(search_statement("dermato", 20, encode_cursor(0.5, 3))))
+    assert sql.count("word_similarity(") == sql.count("CAST(word_similarity(") == 4
+    assert sql.count("AS DOUBLE PRECISION)") == 4
+
+
+def test_search_matches_like_wildcards_literally():
+    params = compile_statement(search_statement("50%_off", 20, None)).params
+    assert "50/%/_off" in params.values()
+
+
+def test_sync_since():
+    now = datetime.datetime(2026, 10, 18, 12, tzinfo=datetime.timezone.utc)
+    recent = now - datetime.timedelta(hours=1)
+
+    assert sync_since(None, now) is None
+    assert sync_since(encode_cursor(recent), now) == recent
+    # older than the tombstones: full sync
+    assert sync_since(encode_cursor(now - datetime.timedelta(days=365)), now) is None
+
+
+@pytest.mark.parametrize("token", [encode_cursor(datetime.datetime(2026, 10, 18)), encode_cursor("yesterday")])
+def test_invalid_sync_token_is_rejected(token):
+    now = datetime.datetime(2026, 10, 18, 12, tzinfo=datetime.timezone.utc)
+    with pytest.raises(HTTPException) as error:
+        sync_since(token, now)
+    assert error.value.status_code == 400
+
+
+def test_sync_pages_keep_the_time_of_the_first_page():
+    started = datetime.datetime(2026, 10, 18, 12, tzinfo=datetime.timezone.utc)
+    assert sync.read_cursor(encode_cursor(started, 42)) == (started, 42)
+
+
+@pytest.mark.parametrize("cursor", [encode_cursor(datetime.datetime(2026, 10, 18), 42),
+                                    encode_cursor(datetime.datetime(2026, 10, 18, tzinfo=datetime.timezone.utc), "42"),
+                                    encode_cursor(42)])
+def test_invalid_sync_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        sync.read_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_only_the_doctor_queries_rendering_the_rating_read_doctor_stats():
+    # principal lookups and writes load doctors without the rating subqueries
+    assert "doctor_stats" not in str(compile_statement(select(models.Doctor)))
+    for sort in ("relevance", "rating"):
+        for search in ("", "cardio"):
+            assert "doctor_stats.rating_count > " in str(compile_statement(search_statement(search, 20, None, sort)))
@@ -0,0 +1,126 @@
+# EXPLAIN EVERY HOT QUERY AND FAIL IF ONE OF THEM SCANS A WHOLE TABLE
+#
+#   DATABASE_NAME=felwaqt_bench pytest tests/test_query_plans.py
+#
+# needs a seeded database (python -m scripts.generate_dataset): on near empty tables
+# postgres rightly prefers sequential scans and every check would fail. skipped when
+# postgres can't be reached or holds no appointments.
+import json
+import pytest
+from sqlalchemy import select, or_, text
+from sqlalchemy.exc import OperationalError
+from database import engine
+from routes.home import search_statement
+from routes.doctor import dashboard_statement
+import models
+
+# tables big enough in production that a sequential scan on them is a regression
+WATCHED_TABLES = {"appointments", "doctors", "patients", "accounts", "reschedules", "feedbacks", "doctor_stats", "tombstones"}
+
+
+def hot_queries(conn, sample):
+    # statements mirroring the filters used by the routes, on ids taken from the data
+    doctor_email = conn.execute(select(models.Doctor.email).where(models.Doctor.id == sample.doctor_id)).scalar()
+    patient_email = conn.execute(select(models.Patient.email).where(models.Patient.id == sample.patient_id)).scalar()
+    order = [models.Appointment.date, models.Appointment.time, models.Appointment.id]
+
+    return {
+        "home search": search_statement("dermato", 20, None),
+        "home search by postal code": search_statement("31000", 20, None),
+        "home sorted by rating": search_statement("", 20, None, "rating"),
+        "doctor profile": select(models.Doctor).where(models.Doctor.id == sample.doctor_id),
+        "doctor dashboard": dashboard_statement(sample.doctor_id, sample.date, 7),
+        "login patient": select(models.Account).where(models.Account.email == patient_email),
+        "login doctor": select(models.Account).where(models.Account.email == doctor_email),
+        "doctor appointments page": select(models.Appointment).where(
+            models.Appointment.doctor_id == sample.doctor_id).order_by(*order).limit(51),
+        "patient appointments page": select(models.Appointment).where(
+            models.Appointment.patient_id == sample.patient_id).order_by(*order).limit(51),
+        "doctor patients page": select(models.Patient).where(models.Patient.id.in_(
+            select(models.Appointment.patient_id).where(models.Appointment.doctor_id == sample.doctor_id)
+            )).order_by(models.Patient.id).limit(51),
+        "doctor feedbacks page": select(models.FeedBack).join(
+            models.Appointment, models.FeedBack.appointment_id == models.Appointment.id
+            ).where(models.Appointment.doctor_id == sample.doctor_id).order_by(*order).limit(51),
+        "patient reschedules": select(models.RescheduleRequest).join(
+            models.Appointment, models.RescheduleRequest.appointment_id == models.Appointment.id
+            ).where(models.Appointment.patient_id == sample.patient_id).order_by(*order),
+        "patient feedbacks": select(models.FeedBack).join(
+            models.Appointment, models.FeedBack.appointment_id == models.Appointment.id
+            ).where(models.Appointment.patient_id == sample.patient_id).order_by(*order),
+        "slot conflict": select(models.Appointment.id).where(
+            models.Appointment.date == sample.date,
+            models.Appointment.time == sample.time,
+            or_(
+            models.Appointment.doctor_id == sample.doctor_id,
+            models.Appointment.patient_id == sample.patient_id
+            )),
+        "appointment by id": select(models.Appointment).where(models.Appointment.id == sample.id),
+        "reschedule by appointment": select(models.RescheduleRequest).where(
+            models.RescheduleRequest.appointment_id == sample.id),
+        "feedback by appointment": select(models.FeedBack).where(models.FeedBack.appointment_id == sample.id),
+        "calendar changes": select(models.Appointment).where(
+            models.Appointment.doctor_id == sample.doctor_id,
+            models.Appointment.updated_at > sample.updated_at).order_by(models.Appointment.updated_at),
+        "calendar tombstones": select(models.Tombstone).where(
+            models.Tombstone.doctor_id == sample.doctor_id, models.Tombstone.entity == "appointment",
+            models.Tombstone.deleted_at > sample.updated_at).order_by(models.Tombstone.deleted_at),
+        "patient sync appointments": select(models.Appointment).where(
+            models.Appointment.patient_id == sample.patient_id,
+            models.Appointment.updated_at > sample.updated_at),
+        "patient sync feedbacks": select(models.FeedBack).where(
+            models.FeedBack.appointment_id.in_(select(models.Appointment.id).where(
+                models.Appointment.patient_id == sample.patient_id,
+                models.Appointment.updated_at > sample.updated_at)),
+            models.FeedBack.updated_at > sample.updated_at),
+        "patient sync tombstones": select(models.Tombstone).where(
+            models.Tombstone.patient_id == sample.patient_id, models.Tombstone.deleted_at > sample.updated_at),
+        # what the ON DELETE CASCADE of doctors and patients runs
+        "cascade from doctor": select(models.Appointment.id).where(models.Appointment.doctor_id == sample.doctor_id),
+        "cascade from patient": select(models.Appointment.id).where(models.Appointment.patient_id == sample.patient_id),
+    }
+
+
+def seq_scans(plan):
+    # relations read by a Seq Scan node anywhere in the plan tree
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in WATCHED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect)
+    result = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    try:
+        conn = engine.connect()
+    except OperationalError:
+        pytest.skip("postgres is not reachable")
+
+    with conn:
+        sample = conn.execute(select(models.Appointment).limit(1)).first()
+        if sample is None:
+            pytest.skip("the database has no appointments, seed it with scripts.generate_dataset")
+        # planner statistics have to match the seeded data
+        conn.execute(text("ANALYZE"))
+        yield conn, sample
+
+
+def test_hot_queries_use_indexes(seeded):
+    conn, sample = seeded
+    failures = {}
+    for name, statement in hot_queries(conn, sample).items():
+        scanned = seq_scans(explain(conn, statement))
+        if scanned:
+            failures[name] = sorted(set(scanned))
+
+    assert not failures, "hot queries falling back to sequential scans: " + "; ".join(
+        f"{name} on {', '.join(tables)}" for name, tables in failures.items())
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+import database
+from cache import doctor_cache
+from etags import render_json
+from querycount import count_queries, assert_max_queries, engines_in_use
+from schemas import DOCTOR_OUT
+from test_etags import DOCTOR
+import main
+
+
+@pytest.fixture
+def engines():
+    primary, replica = create_engine("sqlite://"), create_engine("sqlite://")
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def run(bind, statements: int):
+    with bind.connect() as conn:
+        for _ in range(statements):
+            conn.execute(text("SELECT 1"))
+
+
+def test_counts_every_engine(engines):
+    primary, replica = engines
+    with count_queries(engines) as counter:
+        run(primary, 2)
+        run(replica, 1)
+    run(replica, 1)
+
+    assert counter.count == 3
+
+
+def test_assert_max_queries(engines):
+    with assert_max_queries(2, engines):
+        run(engines[1], 2)
+
+    with pytest.raises(AssertionError, match="3 SQL statements"):
+        with assert_max_queries(2, engines):
+            run(engines[0], 3)
+
+
+def test_listens_on_every_engine_by_default(monkeypatch):
+    replica = create_engine("sqlite://")
+    monkeypatch.setattr("querycount.replica_engines", [replica])
+
+    assert engines_in_use()[0] is database.engine
+    with count_queries() as counter:
+        run(replica, 1)
+    assert counter.count == 1
+
+
+def test_cached_profile_runs_no_sql():
+    doctor_cache.set(DOCTOR.id, render_json(DOCTOR_OUT, DOCTOR))
+    try:
+        with assert_max_queries(0):
+            assert TestClient(main.app).get("/doctors/1").status_code == 200
+    finally:
+        doctor_cache.invalidate(DOCTOR.id)
@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from cache import recent_writers
+from database import reads_from_primary, PRIMARY_COOKIE
+from oauth2 import create_access_token
+import main
+
+REPLICAS = ["replica"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # main.read_own_writes in front of a write and a read telling where it would read from
+    monkeypatch.setattr(main, "replica_engines", REPLICAS)
+    recent_writers.clear()
+    app = FastAPI()
+    app.middleware("http")(main.read_own_writes)
+
+    @app.post("/write")
+    def write(fail: bool = False):
+        if fail:
+            raise HTTPException(status_code=409, detail="Conflict")
+        return {}
+
+    @app.get("/read")
+    def read(request: Request):
+        return {"primary": reads_from_primary(request, REPLICAS)}
+
+    yield TestClient(app)
+    recent_writers.clear()
+
+
+def bearer(role: str, user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': user_id, 'role': role})}"}
+
+
+def test_reads_go_to_the_replicas_without_a_write(client):
+    assert client.get("/read").json() == {"primary": False}
+    assert client.get("/read", headers=bearer("patient", 1)).json() == {"primary": False}
+
+
+def test_the_cookie_sends_the_next_reads_to_the_primary(client):
+    response = client.post("/write")
+    assert PRIMARY_COOKIE in response.cookies
+    assert client.get("/read").json() == {"primary": True}
+
+
+def test_a_principal_reads_its_own_writes_without_the_cookie(client):
+    client.post("/write", headers=bearer("patient", 1))
+    client.cookies.clear()
+
+    assert client.get("/read", headers=bearer("patient", 1)).json() == {"primary": True}
+    # other callers, and the doctor with the same id, keep reading from the replicas
+    assert client.get("/read", headers=bearer("patient", 2)).json() == {"primary": False}
+    assert client.get("/read", headers=bearer("doctor", 1)).json() == {"primary": False}
+
+
+def test_failed_writes_do_not_stick_to_the_primary(client):
+    response = client.post("/write", params={"fail": True}, headers=bearer("patient", 1))
+    assert PRIMARY_COOKIE not in response.cookies
+    assert client.get("/read", headers=bearer("patient", 1)).json() == {"primary": False}
+
+
+def test_everything_reads_from_the_primary_without_replicas():
+    app = FastAPI()
+
+    @app.get("/read")
+    def read(request: Request):
+        return {"primary": reads_from_primary(request, [])}
+
+    assert TestClient(app).get("/read").json() == {"primary": True}
@@ -0,0 +1,67 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from starlette.routing import Match
+from sqlalchemy.exc import IntegrityError
+from cache import principal_cache
+from routes import aio, doctor, patient, home
+
+
+def resolve(app, method: str, path: str):
+    # the endpoint starlette dispatches the request to, in registration order
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.endpoint
+    return None
+
+
+def build_app(async_routes: bool):
+    # the routers in the order main.py registers them, aio first when DATABASE_ASYNC is set
+    app = FastAPI()
+    for router in ([aio.router] if async_routes else []) + [doctor.router, patient.router, home.router]:
+        app.include_router(router)
+    return app
+
+
+NAMED_DOCTOR_PATHS = [
+    ("/doctors/patients", doctor.get_doctor_patients),
+    ("/doctors/feedbacks", doctor.get_feedbacks),
+    ("/doctors/dashboard", doctor.get_dashboard),
+]
+
+
+@pytest.mark.parametrize("path, endpoint", NAMED_DOCTOR_PATHS)
+def test_named_doctor_paths_in_sync_mode(path, endpoint):
+    assert resolve(build_app(False), "GET", path) is endpoint
+
+
+@pytest.mark.parametrize("path, endpoint", NAMED_DOCTOR_PATHS + [
+    ("/doctors/appointments", aio.get_doctor_appointments_async),
+    ("/doctors/12", aio.get_doctor_async),
+    ("/patients/appointments", aio.get_patient_appointments_async),
+])
+def test_named_doctor_paths_in_async_mode(path, endpoint):
+    assert resolve(build_app(True), "GET", path) is endpoint
+
+
+def test_doctor_profile_in_sync_mode():
+    assert resolve(build_app(False), "GET", "/doctors/12") is doctor.get_doctor
+    assert resolve(build_app(False), "PATCH", "/doctors/12") is doctor.update_doctor
+
+
+@pytest.mark.parametrize("constraint, detail", [
+    ("appointments_patient_id_fkey", "User not found"),
+    ("appointments_doctor_id_fkey", "Doctor with id: 7 doesn't exists."),
+])
+def test_booking_reports_the_missing_account(constraint, detail):
+    orig = SimpleNamespace(diag=SimpleNamespace(constraint_name=constraint))
+    principal_cache.set(("patient", 3), "cached")
+
+    error = patient.unknown_account_error(IntegrityError("INSERT INTO appointments", {}, orig), 7, 3) #type: ignore
+
+    assert (error.status_code, error.detail) == (404, detail)
+    # a deleted patient is looked up again on its next request
+    assert (principal_cache.get(("patient", 3)) is None) == (constraint == "appointments_patient_id_fkey")
+    principal_cache.invalidate(("patient", 3))
@@ -1,9 +1,69 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from config import settings
+from metrics import PASSWORD_HASHING
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# new hashes use the configured scheme and costs, hashes made with another scheme
+# or other costs are still verified but reported as needing an update (see verify_and_update)
+pwd_context = CryptContext(
+    schemes=[settings.password_scheme] + [scheme for scheme in ("bcrypt", "argon2") if scheme != settings.password_scheme],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+    argon2__time_cost=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+)
 
-def hash(password: str):
+# hashing runs in its own processes so a burst of logins can't take every request worker,
+# at most hashing_workers + hashing_queue_depth hashes are running or waiting, past that requests fail fast
+_executor = None
+_executor_lock = threading.Lock()
+_hashing_slots = threading.BoundedSemaphore(settings.hashing_workers + settings.hashing_queue_depth)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.hashing_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _run_hashing(operation: str, function, *args):
+    if not _hashing_slots.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Server is busy, please try again.",
+                            headers={"Retry-After": "1"})
+    try:
+        with PASSWORD_HASHING.labels(operation).time():
+            return _get_executor().submit(function, *args).result()
+    finally:
+        _hashing_slots.release()
+
+
+# run inside the pool processes
+def _hash(password: str):
     return pwd_context.hash(password)
 
+def _verify(password, hashed_password):
+    return pwd_context.verify(password, hashed_password)
+
+def _verify_and_update(password, hashed_password):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def hash(password: str):
+    return _run_hashing("hash", _hash, password)
+
 def verify(password, hashed_password):
-    return pwd_context.verify(password, hashed_password)
\ No newline at end of file
+    return _run_hashing("verify", _verify, password, hashed_password)
+
+def verify_and_update(password, hashed_password):
+    # returns (verified, new_hash), new_hash is set when the stored hash
+    # doesn't use the configured scheme and costs anymore
+    return _run_hashing("verify", _verify_and_update, password, hashed_password)